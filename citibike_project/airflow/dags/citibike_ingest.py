@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import sys
+import shlex
+from datetime import datetime, timedelta
+
+from airflow.decorators import dag, task, task_group
+from airflow.models import Pool, Variable
+
+
+## Declare global variables
+ETL_DIR = os.environ.get("CITIBIKE_ETL_DIR", "/opt/airflow/etl")  # etl/ mounted into the airflow container
+WORK_DIR = os.environ.get("CITIBIKE_WORK_DIR", "/opt/airflow")  # ./data/citibike_data is resolved from here
+ETL_ARGS_VARIABLE = "citibike_etl_args"  # ingest_data.py options, e.g. "--host postgres-db --normalize"
+
+# Concurrent postgres writers and BigQuery exports across all runs of the DAG
+POSTGRES_POOL = "citibike_postgres"
+BIGQUERY_POOL = "citibike_bigquery"
+POOL_SLOTS = {
+    POSTGRES_POOL: int(os.environ.get("CITIBIKE_POSTGRES_SLOTS", 4)),
+    BIGQUERY_POOL: int(os.environ.get("CITIBIKE_BIGQUERY_SLOTS", 1)),
+}
+
+default_args = {
+    "owner": "citibike",
+    "retries": 2,
+    "retry_delay": timedelta(minutes=5),
+    "retry_exponential_backoff": True,
+}
+
+
+def run_etl(stage, archive=None, rows_loaded=None):
+    """Run one stage of ingest_data.py in the task's process, return its result as the task's XCom"""
+    if ETL_DIR not in sys.path:
+        sys.path.insert(0, ETL_DIR)
+    # Imported when the task runs, so parsing the DAG stays cheap
+    import ingest_data
+
+    argv = shlex.split(Variable.get(ETL_ARGS_VARIABLE, default_var="")) + ["--stage", stage]
+    if archive:
+        argv += ["--archive", archive]
+    if rows_loaded is not None:
+        argv += ["--rows_loaded", str(rows_loaded)]
+    os.chdir(WORK_DIR)
+    return ingest_data.main(ingest_data.build_parser().parse_args(argv))
+
+
+@task
+def create_pools():
+    """Create the pools on first run; slots changed later in the UI are kept"""
+    for name, slots in POOL_SLOTS.items():
+        if Pool.get_pool(name) is None:
+            Pool.create_or_update_pool(name, slots=slots, description="Citi Bike ingestion", include_deferred=False)
+
+
+@task
+def setup_database():
+    # Tables the loads write to, created once instead of by every mapped task racing the DDL
+    return run_etl("setup")
+
+
+@task
+def list_archives():
+    # New or changed archives only when ingest_data.py keeps its manifest
+    return run_etl("list")
+
+
+@task(retries=4, retry_delay=timedelta(minutes=1), max_active_tis_per_dagrun=8)
+def download(url):
+    # Partial downloads resume on retry
+    return run_etl("download", url)
+
+
+@task
+def extract(url):
+    return run_etl("extract", url)
+
+
+@task(pool=POSTGRES_POOL)
+def load(url):
+    return run_etl("load", url)
+
+
+@task
+def finish(url, rows_loaded):
+    # Lakehouse export, object store copy and manifest entry
+    return run_etl("finish", url, rows_loaded)
+
+
+@task
+def compress(url):
+    return run_etl("compress", url)
+
+
+@task(pool=BIGQUERY_POOL)
+def bigquery_export():
+    return run_etl("bigquery")
+
+
+@task_group
+def ingest_month(url):
+    """One monthly archive; each month is a mapped instance that fails and retries on its own"""
+    rows_loaded = load(url)
+    download(url) >> extract(url) >> rows_loaded
+    finish(url, rows_loaded) >> compress(url)
+
+
+@dag(
+    dag_id="citibike_ingest",
+    schedule="@monthly",
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    max_active_runs=1,
+    default_args=default_args,
+    tags=["citibike", "etl"],
+)
+def citibike_ingest():
+    """Ingest every pending Citi Bike archive in parallel, one mapped task group per month
+
+    Loads are capped by the citibike_postgres pool and the BigQuery export by
+    citibike_bigquery, so a backfill of many months never opens more
+    database writers than the pools allow. The tables are created first, once.
+    """
+    pools = create_pools()
+    setup = setup_database()
+    archives = list_archives()
+    pools >> [setup, archives]
+    setup >> [ingest_month.expand(url=archives), bigquery_export()]
+
+
+citibike_ingest()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import sys
+import json
+import gzip
+import shutil
+import zipfile
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from datetime import datetime, timezone
+from time import perf_counter
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# Benchmarked code lives next door in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from synthetic_data import BENCH_DATA_DIR, generate_archive
+from downloader import make_session, fetch_file
+from schemas import read_csv_chunks
+from normalize import canonical_frame, normalize_chunk
+from loaders import psql_insert_copy, pipelined_load
+from instrumentation import peak_rss_mb
+from compression import compress_and_verify
+
+
+## Declare global variables
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BENCH_TABLE = "bench_trips"
+CHUNKSIZE = 200_000
+REGRESSION_THRESHOLD = 0.10  # 10% slower or bigger than the baseline fails the run
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process since exec; ru_maxrss would carry over the parent's high-water mark"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+## Benchmarks, each returns the number of rows processed (None: every row of the csv)
+
+def bench_download_extract(zip_path, csv_path, workdir, **_):
+    """In-process download from a local HTTP server standing in for the bucket, then extractall"""
+    handler = partial(_QuietHandler, directory=str(Path(zip_path).parent))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/{Path(zip_path).name}"
+        file_path = fetch_file(url, Path(workdir) / "archive_files", session=make_session())
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            zip_ref.extractall(Path(workdir) / "unzipped_files")
+    finally:
+        server.shutdown()
+    return None
+
+
+def bench_parse_pandas(zip_path, csv_path, **_):
+    """pd.read_csv with inferred dtypes, the original parser"""
+    rows = 0
+    for df in pd.read_csv(csv_path, chunksize=CHUNKSIZE):
+        rows += len(df)
+    return rows
+
+
+def bench_parse_arrow(zip_path, csv_path, **_):
+    """pyarrow.csv with the declared Citi Bike schema"""
+    return sum(len(df) for df in read_csv_chunks(csv_path, chunksize=CHUNKSIZE))
+
+
+def bench_parse_zip_stream(zip_path, csv_path, **_):
+    """Arrow parser reading the csv member straight out of the zip"""
+    with zipfile.ZipFile(zip_path) as zip_ref, zip_ref.open(Path(csv_path).name) as csv_file:
+        return sum(len(df) for df in read_csv_chunks(csv_file, chunksize=CHUNKSIZE))
+
+
+def bench_normalize(zip_path, csv_path, **_):
+    """Arrow parse plus mapping onto the canonical trip schema"""
+    return sum(len(normalize_chunk(df)) for df in read_csv_chunks(csv_path, chunksize=CHUNKSIZE))
+
+
+def _load(db_url, csv_path, method=None, writers=0, max_rows=None):
+    engine = create_engine(db_url, pool_size=max(5, writers + 1))
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+    def chunks():
+        rows = 0
+        for df in read_csv_chunks(csv_path, chunksize=CHUNKSIZE):
+            df = normalize_chunk(df)
+            if max_rows is not None:
+                df = df.head(max_rows - rows)
+            rows += len(df)
+            yield df
+            if max_rows is not None and rows >= max_rows:
+                return
+
+    def write_chunk(conn, df):
+        df.to_sql(BENCH_TABLE, conn, if_exists="append", index=False, method=method)
+
+    with engine.begin() as conn:
+        canonical_frame().to_sql(BENCH_TABLE, conn, if_exists="replace", index=False)
+    if writers:
+        return pipelined_load(chunks(), write_chunk, engine, writers=writers)
+    rows = 0
+    with engine.begin() as conn:
+        for df in chunks():
+            write_chunk(conn, df)
+            rows += len(df)
+    return rows
+
+
+def bench_load_insert(zip_path, csv_path, db_url=None, insert_rows=None, **_):
+    """DataFrame.to_sql with row INSERTs, the original loader (capped at insert_rows)"""
+    return _load(db_url, csv_path, method=None, max_rows=insert_rows)
+
+
+def bench_load_copy(zip_path, csv_path, db_url=None, **_):
+    """to_sql with COPY FROM STDIN, serial parse then write"""
+    return _load(db_url, csv_path, method=psql_insert_copy)
+
+
+def bench_load_copy_pipelined(zip_path, csv_path, db_url=None, **_):
+    """COPY with parsing overlapped by two writer threads"""
+    return _load(db_url, csv_path, method=psql_insert_copy, writers=2)
+
+
+def bench_gzip(zip_path, csv_path, workdir, **_):
+    """gzip.open + copyfileobj at the default level, the original single-threaded compression"""
+    target = Path(workdir) / f"{Path(csv_path).name}.gz"
+    with open(csv_path, 'rb') as f_in, gzip.open(target, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    return None
+
+
+def _bench_compress(csv_path, workdir, codec):
+    source = Path(workdir) / Path(csv_path).name
+    shutil.copyfile(csv_path, source)
+    compress_and_verify(source, codec=codec, threads=os.cpu_count() or 1)
+    return None
+
+
+def bench_compress_gzip(zip_path, csv_path, workdir, **_):
+    """Block-parallel gzip on every core, verified before the source is removed"""
+    return _bench_compress(csv_path, workdir, "gzip")
+
+
+def bench_compress_zstd(zip_path, csv_path, workdir, **_):
+    """Block-parallel zstd on every core, verified before the source is removed"""
+    return _bench_compress(csv_path, workdir, "zstd")
+
+
+BENCHMARKS = {
+    "download_extract": bench_download_extract,
+    "parse_pandas": bench_parse_pandas,
+    "parse_arrow": bench_parse_arrow,
+    "parse_zip_stream": bench_parse_zip_stream,
+    "normalize": bench_normalize,
+    "load_insert": bench_load_insert,
+    "load_copy": bench_load_copy,
+    "load_copy_pipelined": bench_load_copy_pipelined,
+    "gzip": bench_gzip,
+    "compress_gzip": bench_compress_gzip,
+    "compress_zstd": bench_compress_zstd,
+}
+DB_BENCHMARKS = {"load_insert", "load_copy", "load_copy_pipelined"}
+
+
+def _run_one(name, kwargs, result_queue):
+    """Child process body: run one benchmark so its peak RSS is measured in isolation"""
+    with tempfile.TemporaryDirectory() as workdir:
+        start = perf_counter()
+        rows = BENCHMARKS[name](workdir=workdir, **kwargs)
+        seconds = perf_counter() - start
+    result_queue.put({"seconds": seconds, "rows": rows, "peak_rss_mb": round(_peak_rss_mb(), 1)})
+
+
+def run_benchmark(name, kwargs, csv_rows, repeat=1):
+    """Run a benchmark in fresh processes, keep the fastest of repeat runs and the highest peak RSS"""
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        result_queue = context.Queue()
+        process = context.Process(target=_run_one, args=(name, kwargs, result_queue))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"Benchmark {name} failed with exit code {process.exitcode}")
+        runs.append(result_queue.get())
+
+    seconds = min(run["seconds"] for run in runs)
+    rows = runs[0]["rows"] if runs[0]["rows"] is not None else csv_rows
+    # csv bytes covered by the run, prorated when a benchmark is capped below the full file
+    nbytes = os.path.getsize(kwargs["csv_path"]) * rows / csv_rows
+    return {"seconds": round(seconds, 3),
+            "rows": rows,
+            "rows_per_sec": round(rows / seconds, 1),
+            "mb_per_sec": round(nbytes / 1024 / 1024 / seconds, 2),
+            "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+            "repeat": repeat}
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return the list of benchmarks whose throughput or memory regressed against the baseline"""
+    regressions = []
+    for key, result in results["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(key)
+        if not before:
+            continue
+        if result["rows_per_sec"] < before["rows_per_sec"] * (1 - threshold):
+            regressions.append(f"{key}: {before['rows_per_sec']} -> {result['rows_per_sec']} rows/s")
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{key}: peak RSS {before['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+    return regressions
+
+
+def latest_results(results_dir):
+    files = sorted(Path(results_dir).glob("*.json"))
+    return files[-1] if files else None
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(params):
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s')
+
+    unknown = set(params.benchmarks.split(",")) - set(BENCHMARKS) if params.benchmarks else set()
+    if unknown:
+        raise ValueError(f"Unknown benchmarks {sorted(unknown)}, expected some of {list(BENCHMARKS)}")
+    selected = params.benchmarks.split(",") if params.benchmarks else list(BENCHMARKS)
+    if not params.db_url:
+        skipped = [name for name in selected if name in DB_BENCHMARKS]
+        if skipped:
+            logging.warning("No --db_url, skipping: %s", ", ".join(skipped))
+        selected = [name for name in selected if name not in DB_BENCHMARKS]
+
+    baseline_path = params.baseline or latest_results(params.results_dir)
+    results = {"revision": git_revision(),
+               "created_at": datetime.now(timezone.utc).isoformat(),
+               "benchmarks": {}}
+
+    for layout in params.layouts.split(","):
+        for rows in [int(value) for value in params.rows.split(",")]:
+            # Synthetic data is cached between runs, keyed by layout and size
+            data_dir = Path(params.data_dir) / f"{layout}_{rows}"
+            month = "2024-01" if layout == "modern" else "2016-10"
+            stem = f"{month.replace('-', '')}-citibike-tripdata"
+            zip_path, csv_path = data_dir / f"{stem}.zip", data_dir / f"{stem}.csv"
+            if not (zip_path.exists() and csv_path.exists()):
+                zip_path, csv_path = generate_archive(data_dir, rows, layout=layout, month=month)
+
+            kwargs = {"zip_path": str(zip_path), "csv_path": str(csv_path),
+                      "db_url": params.db_url, "insert_rows": params.insert_rows}
+            for name in selected:
+                key = f"{name}[{layout},{rows}]"
+                result = run_benchmark(name, kwargs, rows, repeat=params.repeat)
+                results["benchmarks"][key] = result
+                logging.info("%-40s %9.2fs %12s rows/s  peak %s MB",
+                             key, result["seconds"], result["rows_per_sec"], result["peak_rss_mb"])
+
+    os.makedirs(params.results_dir, exist_ok=True)
+    results_path = Path(params.results_dir) / f"{datetime.now():%Y%m%d-%H%M%S}-{results['revision']}.json"
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    logging.info("Results written: %s", results_path)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), threshold=params.threshold)
+        if regressions:
+            logging.error("Regressions against %s:\n  %s", baseline_path, "\n  ".join(regressions))
+            sys.exit(1)
+        logging.info("No regression against %s", baseline_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Citi Bike ingestion hot paths on synthetic data')
+    parser.add_argument('--rows', required=False, help='comma-separated dataset sizes in rows', default='1000000')
+    parser.add_argument('--layouts', required=False, help='comma-separated csv layouts: modern,legacy', default='modern,legacy')
+    parser.add_argument('--benchmarks', required=False, help=f'comma-separated subset of: {",".join(BENCHMARKS)}', default=None)
+    parser.add_argument('--db_url', required=False, help='sqlalchemy url of a local postgres for the load benchmarks', default=None)
+    parser.add_argument('--insert_rows', required=False, type=int, help='row cap for the slow row-INSERT loader', default=200_000)
+    parser.add_argument('--repeat', required=False, type=int, help='runs per benchmark, the fastest is kept', default=3)
+    parser.add_argument('--data_dir', required=False, help='cache directory for the synthetic data', default=BENCH_DATA_DIR)
+    parser.add_argument('--results_dir', required=False, help='directory where results are stored', default=str(RESULTS_DIR))
+    parser.add_argument('--baseline', required=False, help='results file to compare with (default: latest in results_dir)', default=None)
+    parser.add_argument('--threshold', required=False, type=float, help='allowed relative slowdown or memory growth', default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import zipfile
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+
+## Declare global variables
+BENCH_DATA_DIR = "./data/bench_data"
+ROWS_PER_BLOCK = 500_000  # rows generated and written at a time, keeps memory flat for 50M rows
+N_STATIONS = 2_000
+
+MODERN_COLUMNS = ["ride_id", "rideable_type", "started_at", "ended_at", "start_station_name",
+                  "start_station_id", "end_station_name", "end_station_id", "start_lat", "start_lng",
+                  "end_lat", "end_lng", "member_casual"]
+LEGACY_COLUMNS = ["tripduration", "starttime", "stoptime", "start station id", "start station name",
+                  "start station latitude", "start station longitude", "end station id", "end station name",
+                  "end station latitude", "end station longitude", "bikeid", "usertype", "birth year", "gender"]
+
+
+def _stations(rng):
+    """Fixed station dictionary around Manhattan, shared by both layouts"""
+    ids = np.array([f"{rng.integers(2000, 8999)}.{rng.integers(0, 99):02d}" for _ in range(N_STATIONS)])
+    names = np.array([f"Synthetic St & {i} Ave" for i in range(N_STATIONS)])
+    lat = rng.uniform(40.64, 40.88, N_STATIONS).round(6)
+    lng = rng.uniform(-74.03, -73.86, N_STATIONS).round(6)
+    return ids, names, lat, lng
+
+
+def _format_timestamps(values, unit):
+    """Format datetime64 values as 'YYYY-MM-DD HH:MM:SS[.fff]' without a python loop"""
+    return np.char.replace(np.datetime_as_string(values, unit=unit), "T", " ")
+
+
+def _trip_block(rng, stations, n, start, layout, offset):
+    """Generate n trips starting within one month of start, in the given layout"""
+    ids, names, lat, lng = stations
+    # Skewed station popularity, like the real data
+    weights = 1.0 / np.arange(1, N_STATIONS + 1) ** 0.8
+    weights /= weights.sum()
+    start_station = rng.choice(N_STATIONS, n, p=weights)
+    end_station = rng.choice(N_STATIONS, n, p=weights)
+    started = np.datetime64(start) + np.sort(rng.integers(0, 28 * 24 * 3600 * 1000, n)).astype("timedelta64[ms]")
+    duration_s = rng.gamma(2.0, 500.0, n).astype(int) + 60
+    ended = started + (duration_s * 1000).astype("timedelta64[ms]")
+
+    if layout == "modern":
+        return pd.DataFrame({
+            "ride_id": [f"{i:016X}" for i in range(offset, offset + n)],
+            "rideable_type": rng.choice(["classic_bike", "electric_bike"], n, p=[0.6, 0.4]),
+            "started_at": _format_timestamps(started, "ms"),
+            "ended_at": _format_timestamps(ended, "ms"),
+            "start_station_name": names[start_station],
+            "start_station_id": ids[start_station],
+            "end_station_name": names[end_station],
+            "end_station_id": ids[end_station],
+            "start_lat": lat[start_station],
+            "start_lng": lng[start_station],
+            "end_lat": lat[end_station],
+            "end_lng": lng[end_station],
+            "member_casual": rng.choice(["member", "casual"], n, p=[0.8, 0.2]),
+        }, columns=MODERN_COLUMNS)
+
+    birth_year = pd.array(rng.integers(1940, 2005, n), dtype="Int64")
+    birth_year[rng.random(n) < 0.1] = pd.NA  # blanks as in real legacy months
+    return pd.DataFrame({
+        "tripduration": duration_s,
+        "starttime": _format_timestamps(started, "s"),
+        "stoptime": _format_timestamps(ended, "s"),
+        "start station id": start_station + 72,
+        "start station name": names[start_station],
+        "start station latitude": lat[start_station],
+        "start station longitude": lng[start_station],
+        "end station id": end_station + 72,
+        "end station name": names[end_station],
+        "end station latitude": lat[end_station],
+        "end station longitude": lng[end_station],
+        "bikeid": rng.integers(14000, 40000, n),
+        "usertype": rng.choice(["Subscriber", "Customer"], n, p=[0.85, 0.15]),
+        "birth year": birth_year,
+        "gender": rng.choice([0, 1, 2], n, p=[0.1, 0.65, 0.25]),
+    }, columns=LEGACY_COLUMNS)
+
+
+def generate_csv(path, rows, layout="modern", month="2024-01", seed=42):
+    """Write a synthetic Citi Bike csv of the given size and layout, return its path"""
+    rng = np.random.default_rng(seed)
+    stations = _stations(rng)
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    written = 0
+    writer = None
+    try:
+        while written < rows:
+            n = min(ROWS_PER_BLOCK, rows - written)
+            block = pa.Table.from_pandas(_trip_block(rng, stations, n, f"{month}-01", layout, written),
+                                         preserve_index=False)
+            if writer is None:
+                # Arrow's csv writer is several times faster than DataFrame.to_csv at 50M rows
+                writer = pa_csv.CSVWriter(str(path), block.schema,
+                                          write_options=pa_csv.WriteOptions(quoting_style="none"))
+            writer.write_table(block)
+            written += n
+    finally:
+        if writer is not None:
+            writer.close()
+    logging.info("Generated %s rows (%s layout): %s", rows, layout, path)
+    return path
+
+
+def generate_archive(out_dir, rows, layout="modern", month="2024-01", seed=42):
+    """Generate a csv and zip it with the bucket's naming, return (zip_path, csv_path)"""
+    stem = f"{month.replace('-', '')}-citibike-tripdata"
+    csv_path = generate_csv(Path(out_dir) / f"{stem}.csv", rows, layout=layout, month=month, seed=seed)
+    zip_path = Path(out_dir) / f"{stem}.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.write(csv_path, arcname=csv_path.name)
+    return zip_path, csv_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic Citi Bike trip csvs and zips')
+    parser.add_argument('--rows', required=False, type=int, help='number of trips to generate', default=1_000_000)
+    parser.add_argument('--layout', required=False, choices=["modern", "legacy"], help='csv layout', default="modern")
+    parser.add_argument('--month', required=False, help='month of the trips, YYYY-MM', default="2024-01")
+    parser.add_argument('--out_dir', required=False, help='output directory', default=BENCH_DATA_DIR)
+    parser.add_argument('--seed', required=False, type=int, help='random seed', default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s')
+    generate_archive(args.out_dir, args.rows, layout=args.layout, month=args.month, seed=args.seed)
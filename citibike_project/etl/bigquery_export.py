@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import logging
+from datetime import date
+from time import perf_counter
+
+import pandas as pd
+import pyarrow as pa
+
+from parallel import run_bounded
+from chunking import DEFAULT_CHUNK_SIZE, ChunkSizer, frame_bytes_per_row
+from checkpoints import completed_sources, write_checkpoint
+
+
+## Declare global variables
+BQ_TRIPS_TABLE = "bigquery-public-data.new_york_citibike.citibike_trips"
+
+# Nullable pandas dtypes for arrow integers: a batch with nulls (e.g. birth_year)
+# would otherwise turn into float64 and its 1983.0 values break COPY into BIGINT
+NULLABLE_INT_DTYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+
+def month_partitions(year):
+    """Split a year into [start, end) month ranges on starttime"""
+    starts = [date(year, month, 1) for month in range(1, 13)] + [date(year + 1, 1, 1)]
+    return list(zip(starts[:-1], starts[1:]))
+
+
+def partition_query(start, end, table=BQ_TRIPS_TABLE):
+    """Build the query for one time range, pruned on starttime instead of paged with OFFSET"""
+    # starttime is a DATETIME column, comparing it to a TIMESTAMP has no matching signature
+    return f"""
+    SELECT *
+    FROM `{table}`
+    WHERE starttime >= DATETIME '{start.isoformat()}'
+      AND starttime < DATETIME '{end.isoformat()}'
+    """
+
+
+def arrow_to_pandas(table):
+    """Convert an arrow table keeping integer columns integer, nulls included"""
+    return table.to_pandas(types_mapper=NULLABLE_INT_DTYPES.get)
+
+
+def iter_partition_batches(client, start, end, bqstorage_client=None):
+    """Yield the arrow record batches of one time range, via the Storage Read API when available"""
+    rows = client.query(partition_query(start, end)).result()
+    yield from rows.to_arrow_iterable(bqstorage_client=bqstorage_client)
+
+
+def create_target_table(client, table_name, engine, transform=None):
+    """(Re)create the postgres table from the BigQuery schema before partitions append to it"""
+    empty = arrow_to_pandas(client.query(f"SELECT * FROM `{BQ_TRIPS_TABLE}` LIMIT 0").result().to_arrow())
+    if transform:
+        empty = transform(empty)
+    with engine.begin() as conn:
+        empty.to_sql(table_name, conn, if_exists='replace', index=False)
+
+
+def export_year(client, year, table_name, engine, to_sql_method=None,
+                bqstorage_client=None, workers=4, transform=None, chunk_sizer=None, checkpoint=False):
+    """Fetch every month of a year concurrently and append its arrow batches to postgres
+
+    Batches are regrouped into chunks of chunk_sizer() rows (a chunking.ChunkSizer,
+    fixed at DEFAULT_CHUNK_SIZE by default) and each load is reported back to it.
+    With checkpoint, every month commits with its checkpoint in one transaction
+    and a re-run only fetches the months not committed yet.
+    """
+    chunk_sizer = chunk_sizer or ChunkSizer(DEFAULT_CHUNK_SIZE)
+    partitions = month_partitions(year)
+    done = set()
+    if checkpoint:
+        with engine.begin() as conn:
+            done = completed_sources(conn, table_name)
+        partitions = [partition for partition in partitions if partition[0].isoformat() not in done]
+        if done:
+            logging.info("Resuming export of %s: %s of 12 months already loaded into %s", year, len(done), table_name)
+    if not done:
+        create_target_table(client, table_name, engine, transform=transform)
+
+    def load_chunk(conn, batches):
+        df = arrow_to_pandas(pa.Table.from_batches(batches))
+        if transform:
+            df = transform(df)
+        start = perf_counter()
+        df.to_sql(table_name, conn, if_exists='append', index=False, method=to_sql_method)
+        chunk_sizer.observe(len(df), perf_counter() - start, frame_bytes_per_row(df))
+        return len(df)
+
+    def load_partition(partition):
+        start, end = partition
+        rows_loaded = 0
+        batches, rows = [], 0
+        # One connection per partition, chunks append in arrival order
+        with engine.begin() as conn:
+            for batch in iter_partition_batches(client, start, end, bqstorage_client=bqstorage_client):
+                if batch.num_rows == 0:
+                    continue
+                batches.append(batch)
+                rows += batch.num_rows
+                if rows >= chunk_sizer():
+                    rows_loaded += load_chunk(conn, batches)
+                    batches, rows = [], 0
+            if batches:
+                rows_loaded += load_chunk(conn, batches)
+            if checkpoint:
+                write_checkpoint(conn, table_name, start.isoformat(), 0, rows_loaded, done=True)
+        logging.info("Loaded %s rows for %s to %s into %s", rows_loaded, start, end, table_name)
+        return rows_loaded
+
+    results = run_bounded(load_partition, partitions, workers=workers)
+    total_rows = sum(results.values())
+    logging.info("Export of %s complete: %s rows into %s", year, total_rows, table_name)
+    return total_rows
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import zlib
+import logging
+
+from sqlalchemy import text
+
+
+## Declare global variables
+CHECKPOINT_TABLE = "ingest_checkpoints"
+
+
+def create_checkpoint_table(engine, table=CHECKPOINT_TABLE):
+    """Create the checkpoint table next to the data it describes"""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                target TEXT NOT NULL,
+                source TEXT NOT NULL,
+                fingerprint TEXT,
+                chunk INTEGER NOT NULL,
+                rows_loaded BIGINT NOT NULL,
+                done BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at TIMESTAMP NOT NULL DEFAULT now(),
+                PRIMARY KEY (target, source)
+            )
+        """))
+
+
+def read_checkpoint(conn, target, source, table=CHECKPOINT_TABLE):
+    """Return the last committed checkpoint of a source into a target table, or None"""
+    row = conn.execute(text(f"SELECT fingerprint, chunk, rows_loaded, done FROM {table} "
+                            f"WHERE target = :target AND source = :source"),
+                       {"target": target, "source": source}).mappings().first()
+    return dict(row) if row else None
+
+
+def write_checkpoint(conn, target, source, chunk, rows_loaded, fingerprint=None, done=False, table=CHECKPOINT_TABLE):
+    """Record progress on conn, so it commits or rolls back together with the chunk it describes"""
+    conn.execute(text(f"""
+        INSERT INTO {table} (target, source, fingerprint, chunk, rows_loaded, done, updated_at)
+        VALUES (:target, :source, :fingerprint, :chunk, :rows_loaded, :done, now())
+        ON CONFLICT (target, source) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, chunk = EXCLUDED.chunk, rows_loaded = EXCLUDED.rows_loaded,
+            done = EXCLUDED.done, updated_at = EXCLUDED.updated_at
+    """), {"target": target, "source": source, "fingerprint": fingerprint, "chunk": chunk,
+           "rows_loaded": rows_loaded, "done": done})
+
+
+def completed_sources(conn, target, table=CHECKPOINT_TABLE):
+    """Sources fully loaded into a target table"""
+    rows = conn.execute(text(f"SELECT source FROM {table} WHERE target = :target AND done"), {"target": target})
+    return {source for (source,) in rows}
+
+
+def _group_filter(group):
+    # Sources of a group are named f"{group}/{name}", compared without LIKE wildcards
+    return "left(source, length(:prefix)) = :prefix", {"prefix": f"{group}/"}
+
+
+def changed_sources(conn, target, group, fingerprints, table=CHECKPOINT_TABLE):
+    """Sources of a group whose checkpoint was taken on another version, or that no longer exist
+
+    fingerprints maps every current source of the group to its fingerprint.
+    """
+    condition, params = _group_filter(group)
+    rows = conn.execute(text(f"SELECT source, fingerprint FROM {table} WHERE target = :target AND {condition}"),
+                        {"target": target, **params})
+    return sorted(source for source, fingerprint in rows if fingerprints.get(source) != fingerprint)
+
+
+def clear_checkpoints(conn, target, group, keep=None, table=CHECKPOINT_TABLE):
+    """Delete the checkpoints of a group of sources (except keep), so they are loaded again"""
+    condition, params = _group_filter(group)
+    conn.execute(text(f"DELETE FROM {table} WHERE target = :target AND {condition} "
+                      f"AND source IS DISTINCT FROM :keep"),
+                 {"target": target, "keep": keep, **params})
+
+
+def file_fingerprint(path, sample_size=1024 * 1024):
+    """Cheap identity of a file version: its size and the crc32 of its first and last MB"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        crc = zlib.crc32(f.read(sample_size))
+        f.seek(max(size - sample_size, 0))
+        crc = zlib.crc32(f.read(sample_size), crc)
+    return f"{size}:{crc:08x}"
+
+
+def resume_point(checkpoint, fingerprint=None):
+    """Return the checkpoint to resume from, or None to load the source from the start
+
+    A checkpoint of another version of the source (fingerprint changed) is ignored.
+    """
+    if checkpoint is None:
+        return None
+    if checkpoint["fingerprint"] != fingerprint:
+        logging.warning("Source changed since its last checkpoint (%s != %s), loading it again",
+                        checkpoint["fingerprint"], fingerprint)
+        return None
+    return checkpoint
+
+
+def skip_rows(chunks, rows):
+    """Drop the first rows of a chunk iterator, i.e. the rows a previous run already committed"""
+    for df in chunks:
+        if rows >= len(df):
+            rows -= len(df)
+            continue
+        if rows:
+            df = df.iloc[rows:]
+            rows = 0
+        yield df
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import logging
+import threading
+
+import pandas as pd
+
+
+## Declare global variables
+DEFAULT_CHUNK_SIZE = 200_000
+MIN_CHUNK_SIZE = 10_000
+MAX_CHUNK_SIZE = 5_000_000
+TARGET_CHUNK_SECONDS = 5.0  # long enough to amortize per-chunk overhead, short enough to keep writers busy
+SAMPLE_ROWS = 1_000  # rows measured with deep=True to estimate the bytes per row
+
+
+def frame_bytes_per_row(df):
+    """Estimate the in-memory bytes per row of a DataFrame, strings included, from a sample"""
+    if len(df) == 0:
+        return 0.0
+    sample = df.head(SAMPLE_ROWS)
+    total = 0.0
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Codes per row, the categories once per chunk
+            total += column.cat.codes.dtype.itemsize + column.cat.categories.memory_usage(deep=True) / len(df)
+        else:
+            total += sample[name].memory_usage(deep=True, index=False) / len(sample)
+    return total
+
+
+class ChunkSizer:
+    """Adaptive chunk size controller targeting a memory budget and a per-chunk load latency
+
+    Every loaded chunk is reported with observe(); the next chunks are sized so
+    that the chunks held at once (inflight) fit in memory_budget_mb, and grown or
+    shrunk towards target_seconds of load time. Without a budget nor a target the
+    size stays fixed at initial (thread-safe, shared by a file's writer threads).
+    """
+
+    def __init__(self, initial=DEFAULT_CHUNK_SIZE, memory_budget_mb=None, target_seconds=None,
+                 inflight=2, min_rows=MIN_CHUNK_SIZE, max_rows=MAX_CHUNK_SIZE):
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        self.target_seconds = target_seconds
+        self.inflight = max(inflight, 1)
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.bytes_per_row = None
+        self._size = int(initial)
+        self._lock = threading.Lock()
+
+    @property
+    def adaptive(self):
+        return bool(self.memory_budget or self.target_seconds)
+
+    @property
+    def size(self):
+        with self._lock:
+            return self._size
+
+    def __call__(self):
+        return self.size
+
+    def observe(self, rows, seconds, bytes_per_row=None):
+        """Record one loaded chunk and resize the next ones, return the new chunk size"""
+        if not self.adaptive or rows <= 0:
+            return self.size
+        with self._lock:
+            if bytes_per_row:
+                # Smoothed, so one odd chunk does not swing the size
+                self.bytes_per_row = (bytes_per_row if self.bytes_per_row is None
+                                      else 0.7 * self.bytes_per_row + 0.3 * bytes_per_row)
+
+            size = self._size
+            if self.target_seconds and seconds > 0:
+                # Throughput-proportional step, at most halving or doubling per chunk
+                size = int(rows * min(max(self.target_seconds / seconds, 0.5), 2.0))
+            if self.memory_budget and self.bytes_per_row:
+                size = min(size if self.target_seconds else self.max_rows,
+                           int(self.memory_budget / (self.bytes_per_row * self.inflight)))
+            size = min(max(size, self.min_rows), self.max_rows)
+
+            if size != self._size:
+                logging.debug("Chunk size %s -> %s rows (%.0f bytes/row, %.2fs for %s rows)",
+                              self._size, size, self.bytes_per_row or 0, seconds, rows)
+                self._size = size
+            return size
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import re
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from chunking import SAMPLE_ROWS, frame_bytes_per_row
+
+
+## Declare global variables
+# float32 keeps coordinates to about 4e-6 degrees (under half a metre) and durations to the second
+FLOAT32_COLUMNS = re.compile(r"(^|_| )(lat|lng|latitude|longitude)$|^trip_?duration(_s)?$", re.IGNORECASE)
+STATION_COLUMNS = re.compile(r"station.*(id|name)$", re.IGNORECASE)
+CATEGORY_COLUMNS = {"rideable_type", "member_casual", "usertype", "user_type", "user type", "source_file"}
+
+
+def frame_bytes(df):
+    """Estimated in-memory size of a DataFrame, strings included"""
+    return int(frame_bytes_per_row(df) * len(df))
+
+
+def default_frame_bytes(df):
+    """Estimated size of the same DataFrame in default pandas dtypes (object strings, 64-bit numbers)"""
+    if len(df) == 0:
+        return 0
+    sample = df.head(SAMPLE_ROWS)
+    widened = {}
+    for name in sample.columns:
+        column = sample[name]
+        if isinstance(column.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(column):
+            widened[name] = column.astype(object)
+        elif pd.api.types.is_float_dtype(column):
+            widened[name] = column.astype(np.float64)
+        elif pd.api.types.is_integer_dtype(column):
+            widened[name] = column.astype("Int64" if column.hasnans else np.int64)
+        else:
+            widened[name] = column
+    return int(pd.DataFrame(widened).memory_usage(deep=True, index=False).sum() / len(sample) * len(df))
+
+
+class StationDictionary:
+    """Station ids and names interned once per run, shared by every chunk as one categorical dtype
+
+    Each distinct station string is kept once; chunks only hold integer codes.
+    Codes are stable because new stations are appended (thread-safe).
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.dtype = pd.CategoricalDtype([])
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def encode(self, column):
+        """Return the column as a categorical over the shared station dictionary"""
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            local_codes, uniques = column.cat.codes.to_numpy(), column.cat.categories
+        else:
+            local_codes, uniques = pd.factorize(column, use_na_sentinel=True)
+        uniques = [str(value) for value in uniques]
+
+        with self._lock:
+            new = [value for value in uniques if value not in self.codes]
+            if new:
+                for value in new:
+                    self.codes[value] = len(self.codes)
+                self.dtype = pd.CategoricalDtype(list(self.codes))
+            dtype = self.dtype
+            mapping = np.array([self.codes[value] for value in uniques] + [-1], dtype=np.int32)
+
+        # -1 (missing) indexes the trailing -1 of the mapping
+        codes = mapping[local_codes]
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=column.index, name=column.name)
+
+
+def compact_frame(df, stations=None):
+    """Downcast a trip chunk: float32 coordinates and durations, categoricals for repeated strings
+
+    Column types are chosen by name, never by the values of one chunk, so every
+    chunk of a file maps onto the same table schema.
+    """
+    df = df.copy(deep=False)
+    for name in df.columns:
+        column = df[name]
+        if FLOAT32_COLUMNS.search(str(name)) and pd.api.types.is_float_dtype(column) and column.dtype != np.float32:
+            df[name] = column.astype(np.float32)
+        elif pd.api.types.is_numeric_dtype(column):
+            continue  # e.g. legacy integer station ids, kept as numbers
+        elif STATION_COLUMNS.search(str(name)) and stations is not None:
+            df[name] = stations.encode(column)
+        elif (STATION_COLUMNS.search(str(name)) or str(name).lower() in CATEGORY_COLUMNS) \
+                and not isinstance(column.dtype, pd.CategoricalDtype):
+            df[name] = column.astype("category")
+    return df
+
+
+def log_saving(df, file=None, chunk=None):
+    """Log the memory a compact chunk saves over default dtypes, return (compact bytes, bytes saved)"""
+    before, after = default_frame_bytes(df), frame_bytes(df)
+    saved = before - after
+    logging.debug("Compacted chunk %s of %s: %.1f MB -> %.1f MB (%.0f%% saved)",
+                  chunk, file, before / 1024 / 1024, after / 1024 / 1024, 100 * saved / max(before, 1))
+    return after, saved
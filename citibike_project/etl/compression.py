@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import zlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+
+
+## Declare global variables
+CODECS = ["gzip", "zstd", "lz4"]
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", "lz4": ".lz4"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3, "lz4": None}  # None: the codec's own default
+BLOCK_SIZE = 32 * 1024 * 1024  # each block is compressed independently, on its own thread
+READ_SIZE = 8 * 1024 * 1024
+
+
+def get_codec(codec="gzip", level=None):
+    """Return the pyarrow codec for a CLI codec name and level"""
+    if codec not in CODECS:
+        logging.error("Unknown compression codec: %s", codec)
+        raise ValueError(f"Unknown compression codec '{codec}', expected one of {CODECS}")
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    return pa.Codec(codec, compression_level=level)
+
+
+def compress_file(path, codec="gzip", level=None, block_size=BLOCK_SIZE, threads=1):
+    """Compress one file block-parallel, return (output path, crc32 and size of the source)
+
+    Blocks become independent gzip members / zstd frames / lz4 frames, so the
+    output is a regular file for gzip -d, zstd -d and lz4 -d.
+    """
+    get_codec(codec, level)  # fail fast on a bad codec or level
+    out_path = f"{path}{EXTENSIONS[codec]}"
+    crc, size = 0, 0
+    pending = deque()
+    # A codec keeps its compressor state, so every thread needs its own
+    local = threading.local()
+
+    def compress_block(block):
+        if not hasattr(local, "codec"):
+            local.codec = get_codec(codec, level)
+        return local.codec.compress(block, asbytes=True)
+
+    # Arrow releases the GIL while compressing, blocks run truly in parallel
+    with ThreadPoolExecutor(max_workers=threads) as executor, \
+            open(path, "rb") as f_in, open(f"{out_path}.part", "wb") as f_out:
+        while True:
+            block = f_in.read(block_size)
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            pending.append(executor.submit(compress_block, block))
+            # Bounded read-ahead, blocks are written back in order
+            if len(pending) >= threads * 2:
+                f_out.write(pending.popleft().result())
+        while pending:
+            f_out.write(pending.popleft().result())
+    os.replace(f"{out_path}.part", out_path)
+    return out_path, crc, size
+
+
+def verify_file(path, codec, crc, size):
+    """Decompress a file as a stream and check it against the source crc32 and size"""
+    check_crc, check_size = 0, 0
+    with pa.CompressedInputStream(pa.OSFile(path), codec) as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                break
+            check_crc = zlib.crc32(data, check_crc)
+            check_size += len(data)
+    return check_crc == crc and check_size == size
+
+
+def compress_and_verify(path, codec="gzip", level=None, block_size=BLOCK_SIZE, threads=1, remove_source=True):
+    """Compress a file, verify the output and only then remove the source, return the output path"""
+    out_path, crc, size = compress_file(path, codec=codec, level=level, block_size=block_size, threads=threads)
+    if not verify_file(out_path, codec, crc, size):
+        os.remove(out_path)
+        logging.error("Compressed file failed verification, source kept: %s", path)
+        raise IOError(f"Verification of {out_path} failed")
+    if remove_source:
+        os.remove(path)
+    logging.info("Compressed file created: %s (%.1f%% of %s bytes)",
+                 out_path, 100 * os.path.getsize(out_path) / max(size, 1), size)
+    return out_path
+
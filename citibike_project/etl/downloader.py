@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from time import monotonic, sleep
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+## Declare global variables
+CHUNK_BYTES = 1024 * 1024
+
+
+class RateLimiter:
+    """Token bucket shared by all download threads to cap total bandwidth"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.tokens = bytes_per_second
+        self.last = monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, nbytes):
+        """Block until nbytes may be sent"""
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            sleep(wait)
+
+
+def make_session(pool_size=10, retries=3):
+    """Create a requests session whose connection pool is reused across downloads"""
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fetch_file(url, dest_dir, session=None, rate_limiter=None, timeout=60):
+    """Download url into dest_dir, resuming partial files and skipping unchanged ones"""
+    session = session or make_session()
+    dest_dir = Path(dest_dir)
+    os.makedirs(dest_dir, exist_ok=True)
+    file_path = dest_dir / os.path.basename(url)
+    part_path = Path(f"{file_path}.part")
+    meta_path = Path(f"{file_path}.meta.json")
+
+    # Conditional request: the server answers 304 if our copy is current
+    headers = {}
+    meta = _read_meta(meta_path)
+    if file_path.exists():
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    # Resume a previously interrupted download of the same object
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if meta.get("etag"):
+            headers["If-Range"] = meta["etag"]
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            logging.info("Not modified, skipping download: %s", file_path)
+            return file_path
+        if response.status_code == 416:
+            # Part file already holds the whole object
+            response.close()
+            offset = None
+        else:
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0  # server ignored the range, start over
+
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+                    if rate_limiter:
+                        rate_limiter.consume(len(chunk))
+                    f.write(chunk)
+
+        meta = {"etag": response.headers.get("ETag", meta.get("etag")),
+                "last_modified": response.headers.get("Last-Modified", meta.get("last_modified"))}
+
+    os.replace(part_path, file_path)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    logging.info("Downloaded %s (resumed from byte %s)", file_path, offset or 0)
+    return file_path
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import io
+import logging
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+
+from instrumentation import timed
+
+
+## Declare global variables
+FEATURES_TABLE = "station_hourly_demand"
+
+# Trip end -> (station id column, station key column, time column, feature column)
+DEMAND_ENDS = [
+    ("start_station_id", "start_station_key", "started_at", "departures"),
+    ("end_station_id", "end_station_key", "ended_at", "arrivals"),
+]
+
+
+class HourlyDemand:
+    """Per-station hourly departures and arrivals, maintained chunk by chunk as trips are loaded
+
+    Every chunk is aggregated with vectorized group-bys and merged into the
+    feature table in the chunk's own transaction, or summed with the file's
+    other chunks by a DemandTally when concurrent writers load them. Rows are
+    kept per source file, so re-loading an archive replaces its counts instead
+    of adding them twice; a (station, hour) feature is the sum over its source files.
+    """
+
+    def __init__(self, table=FEATURES_TABLE, station_keys=False):
+        self.table = table
+        self.station_keys = station_keys
+        self.station_column = "station_key" if station_keys else "station_id"
+
+    def create(self, engine):
+        """Create the feature table if missing, its primary key doubles as the lookup index"""
+        station_type = "INTEGER" if self.station_keys else "TEXT"
+        with engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    {self.station_column} {station_type} NOT NULL,
+                    hour TIMESTAMP NOT NULL,
+                    source_file TEXT NOT NULL,
+                    departures INTEGER NOT NULL DEFAULT 0,
+                    arrivals INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY ({self.station_column}, hour, source_file)
+                )
+            """))
+        return self
+
+    def aggregate(self, df):
+        """Count the departures and arrivals of a canonical trip chunk per station and hour"""
+        counts = []
+        for id_column, key_column, time_column, feature in DEMAND_ENDS:
+            station = df[key_column if self.station_keys else id_column]
+            if isinstance(station.dtype, pd.CategoricalDtype):
+                # Start and end stations may not share categories, align on the values
+                station = station.astype(object)
+            ends = pd.DataFrame({self.station_column: station, "hour": df[time_column].dt.floor("h")})
+            counts.append(ends.groupby([self.station_column, "hour"]).size().rename(feature))
+        return pd.concat(counts, axis=1).fillna(0).astype("int32").reset_index()
+
+    def tally(self):
+        """Return an empty DemandTally summing the counts of one source file"""
+        return DemandTally(self)
+
+    def clear(self, conn, source_file):
+        """Drop the counts of a source file that is loaded again"""
+        conn.execute(text(f"DELETE FROM {self.table} WHERE source_file = :source_file"),
+                     {"source_file": source_file})
+
+    def _stage(self, conn, demand):
+        """COPY the chunk's counts into a session temp table, cheaper than binding them as parameters"""
+        station_type = "INTEGER" if self.station_keys else "TEXT"
+        conn.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {self.table}_chunk "
+                          f"({self.station_column} {station_type}, hour TIMESTAMP, departures INTEGER, arrivals INTEGER) "
+                          f"ON COMMIT DELETE ROWS"))
+        conn.execute(text(f"TRUNCATE {self.table}_chunk"))
+        buffer = io.StringIO()
+        demand.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        with conn.connection.cursor() as cur:
+            cur.copy_expert(f"COPY {self.table}_chunk FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def merge(self, conn, df, source_file=None, chunk=None):
+        """Add the counts of one trip chunk to the feature table on conn, return the feature rows merged"""
+        with timed("features", file=source_file, chunk=chunk) as metrics:
+            metrics["rows"] = self.merge_counts(conn, self.aggregate(df), source_file=source_file)
+        return metrics["rows"]
+
+    def merge_counts(self, conn, demand, source_file=None):
+        """Add counts built by aggregate() to the feature table on conn, return the feature rows merged"""
+        if demand.empty:
+            return 0
+        self._stage(conn, demand)
+        # Additive: a source file's hours may span several chunks
+        conn.execute(text(f"""
+            INSERT INTO {self.table} AS f ({self.station_column}, hour, source_file, departures, arrivals)
+            SELECT {self.station_column}, hour, :source_file, departures, arrivals
+            FROM {self.table}_chunk
+            ON CONFLICT ({self.station_column}, hour, source_file) DO UPDATE
+            SET departures = f.departures + EXCLUDED.departures,
+                arrivals = f.arrivals + EXCLUDED.arrivals
+        """), {"source_file": source_file or ""})
+        logging.debug("Merged %s station hours of %s into %s", len(demand), source_file, self.table)
+        return len(demand)
+
+
+class DemandTally:
+    """Hourly counts of one source file summed in memory across its chunks (thread-safe)
+
+    Writers loading the chunks of a file concurrently (loaders.pipelined_load)
+    would upsert the same boundary station hours from different transactions
+    and deadlock; they add their chunks here instead, and the file's counts
+    are merged once when all of them are loaded.
+    """
+
+    def __init__(self, demand):
+        self.demand = demand
+        self.counts = None
+        self._lock = threading.Lock()
+
+    def add(self, df, source_file=None, chunk=None):
+        """Add the counts of one trip chunk"""
+        with timed("features", file=source_file, chunk=chunk) as metrics:
+            counts = self.demand.aggregate(df).set_index([self.demand.station_column, "hour"])
+            metrics["rows"] = len(counts)
+            with self._lock:
+                self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0)
+
+    def merge(self, conn, source_file=None):
+        """Merge the summed counts into the feature table on conn, return the feature rows merged"""
+        if self.counts is None:
+            return 0
+        return self.demand.merge_counts(conn, self.counts.astype("int32").reset_index(), source_file=source_file)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import json
+import logging
+import resource
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import perf_counter
+
+
+## Declare global variables
+REPORT_PATH = "./data/citibike_data/run_report.json"
+STAGES = ["listing", "download", "extract", "parse", "transform", "compact", "stations", "load", "features", "compress", "upload"]
+
+
+def peak_rss_mb():
+    """High-water mark of the process resident memory, in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+class RunReport:
+    """Collects per-stage, per-file and per-chunk measurements of one ETL run (thread-safe)"""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, stage, file=None, chunk=None):
+        """Time the wrapped block; set metrics['rows'] / ['bytes'] / ['bytes_saved'] inside it, or metrics['skip']"""
+        metrics = {"rows": 0, "bytes": 0, "bytes_saved": 0, "skip": False}
+        start = perf_counter()
+        try:
+            yield metrics
+        finally:
+            if not metrics["skip"]:
+                self.record(stage, perf_counter() - start, rows=metrics["rows"], nbytes=metrics["bytes"],
+                            bytes_saved=metrics["bytes_saved"], file=file, chunk=chunk)
+
+    def record(self, stage, seconds, rows=0, nbytes=0, bytes_saved=0, file=None, chunk=None):
+        record = {"stage": stage, "file": str(file) if file is not None else None, "chunk": chunk,
+                  "seconds": round(seconds, 6), "rows": int(rows), "bytes": int(nbytes),
+                  "bytes_saved": int(bytes_saved),
+                  "peak_rss_mb": round(peak_rss_mb(), 1)}
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self):
+        """Aggregate the records per stage, with throughput"""
+        with self._lock:
+            records = list(self.records)
+        stages = {}
+        for record in records:
+            stage = stages.setdefault(record["stage"], {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0,
+                                                        "bytes_saved": 0, "peak_rss_mb": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += record["seconds"]
+            stage["rows"] += record["rows"]
+            stage["bytes"] += record["bytes"]
+            stage["bytes_saved"] += record.get("bytes_saved", 0)
+            stage["peak_rss_mb"] = max(stage["peak_rss_mb"], record["peak_rss_mb"])
+        for stage in stages.values():
+            seconds = max(stage["seconds"], 1e-9)
+            stage["rows_per_sec"] = round(stage["rows"] / seconds, 1) if stage["rows"] else 0.0
+            stage["mb_per_sec"] = round(stage["bytes"] / 1024 / 1024 / seconds, 2) if stage["bytes"] else 0.0
+            stage["seconds"] = round(stage["seconds"], 3)
+        return dict(sorted(stages.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES)))
+
+    def write(self, path=REPORT_PATH):
+        """Write the run report as json, and as Prometheus text next to it (.prom)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        summary = self.summary()
+        with self._lock:
+            records = list(self.records)
+        report = {"started_at": self.started_at,
+                  "finished_at": datetime.now(timezone.utc).isoformat(),
+                  "peak_rss_mb": round(peak_rss_mb(), 1),
+                  "stages": summary,
+                  "records": records}
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        prom_path = os.path.splitext(path)[0] + ".prom"
+        lines = []
+        for metric, key, help_text in [("citibike_etl_stage_seconds_total", "seconds", "Wall time spent in the stage"),
+                                       ("citibike_etl_stage_rows_total", "rows", "Rows processed by the stage"),
+                                       ("citibike_etl_stage_bytes_total", "bytes", "Bytes processed by the stage"),
+                                       ("citibike_etl_stage_bytes_saved_total", "bytes_saved", "In-memory bytes saved by the stage (compact dtypes)"),
+                                       ("citibike_etl_stage_rows_per_second", "rows_per_sec", "Stage throughput in rows per second"),
+                                       ("citibike_etl_stage_peak_rss_megabytes", "peak_rss_mb", "Peak resident memory seen at the end of the stage")]:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {'counter' if metric.endswith('_total') else 'gauge'}")
+            for stage, values in summary.items():
+                lines.append(f'{metric}{{stage="{stage}"}} {values[key]}')
+        with open(prom_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        logging.info("Run report written: %s, %s", path, prom_path)
+        for stage, values in summary.items():
+            logging.info("%-9s %8.2fs %12s rows %10s rows/s peak %s MB",
+                         stage, values["seconds"], values["rows"], values["rows_per_sec"], values["peak_rss_mb"])
+        return report
+
+
+# Shared report for the current process, stages record into it from any thread
+REPORT = RunReport()
+timed = REPORT.timed
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import logging
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from schemas import iter_csv_batches
+from normalize import CANONICAL_DTYPES, normalize_chunk
+from object_store import make_sink
+
+
+## Declare global variables
+LAKEHOUSE_DIR = "./data/citibike_data/lakehouse"
+LAKEHOUSE_BUCKET = "lakehouse"
+TRIPS_PREFIX = "citibike/trips"
+ROW_GROUP_SIZE = 1_000_000  # rows, large groups keep min/max statistics useful for pruning
+COMPRESSION = "zstd"
+COMPRESSION_LEVEL = 3
+
+# Every layout is written in the canonical trip schema, so the dataset has one file schema
+# (categoricals as plain strings, parquet dictionary-encodes them per column chunk)
+ARROW_TYPES = {
+    "string": pa.string(),
+    "category": pa.string(),
+    "datetime64[ns]": pa.timestamp("ms"),
+    "float32": pa.float32(),
+    "Int32": pa.int32(),
+    "Int16": pa.int16(),
+    "Int8": pa.int8(),
+}
+TRIPS_SCHEMA = pa.schema([(name, ARROW_TYPES[dtype]) for name, dtype in CANONICAL_DTYPES.items()])
+
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+
+def _with_partition_columns(batches, source_file=None):
+    """Map batches of any layout onto the canonical schema and add year and month columns of started_at"""
+    for batch in batches:
+        df = normalize_chunk(batch.to_pandas(), source_file=source_file)
+        batch = pa.RecordBatch.from_pandas(df, schema=TRIPS_SCHEMA, preserve_index=False)
+        started = batch.column("started_at")
+        batch = pa.RecordBatch.from_arrays(
+            batch.columns + [pc.cast(pc.year(started), pa.int16()), pc.cast(pc.month(started), pa.int8())],
+            names=batch.schema.names + ["year", "month"],
+        )
+        yield batch
+
+
+def csv_to_parquet(source, source_name, out_dir=LAKEHOUSE_DIR, row_group_size=ROW_GROUP_SIZE, source_file=None):
+    """Write one trip csv as canonical zstd parquet partitioned by year/month, return the files written
+
+    source_file is stored in the source_file column, as in the trips table.
+    """
+    batches = _with_partition_columns(iter_csv_batches(source), source_file=source_file)
+    first = next(batches, None)
+    if first is None:
+        logging.warning("Empty csv, no parquet written: %s", source_name)
+        return []
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    written = []
+    file_options = ds.ParquetFileFormat().make_write_options(compression=COMPRESSION,
+                                                             compression_level=COMPRESSION_LEVEL,
+                                                             write_statistics=True)
+    ds.write_dataset(
+        all_batches(),
+        base_dir=Path(out_dir) / TRIPS_PREFIX,
+        schema=first.schema,
+        format="parquet",
+        file_options=file_options,
+        partitioning=PARTITIONING,
+        # Name files after the source so re-running a month overwrites its own files
+        basename_template=f"{Path(source_name).stem}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        min_rows_per_group=row_group_size,
+        max_rows_per_group=row_group_size,
+        file_visitor=lambda written_file: written.append(written_file.path),
+    )
+    logging.info("Parquet written for %s: %s files", source_name, len(written))
+    return written
+
+
+def upload_to_minio(files, local_root=LAKEHOUSE_DIR, bucket=LAKEHOUSE_BUCKET,
+                    part_size=64 * 1024 * 1024, max_concurrency=8, workers=4):
+    """Upload files to MinIO concurrently with multipart uploads, keeping their path under local_root as key
+
+    Files whose object already holds the same content (md5) are skipped.
+    """
+    sink = make_sink("minio", bucket, part_size=part_size, max_concurrency=max_concurrency)
+    return sink.upload_files(files, local_root=local_root, workers=workers)
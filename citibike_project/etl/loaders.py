@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import csv
+import io
+import queue
+import contextlib
+import logging
+import threading
+
+
+## Declare global variables
+LOAD_METHODS = ["copy", "insert"]
+
+# Queue sentinel telling a writer thread there are no more chunks
+_DONE = object()
+
+
+def psql_insert_copy(table, conn, keys, data_iter):
+    """Stream a chunk into postgres with COPY FROM STDIN (pandas to_sql method callable)"""
+    # Write the chunk as csv into an in-memory buffer, no temp files
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(data_iter)
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{key}"' for key in keys)
+    if table.schema:
+        table_name = f'"{table.schema}"."{table.name}"'
+    else:
+        table_name = f'"{table.name}"'
+
+    # Use the raw psycopg2 connection underneath the sqlalchemy one
+    dbapi_conn = conn.connection
+    with dbapi_conn.cursor() as cur:
+        cur.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def get_to_sql_method(load_method="copy"):
+    """Return the to_sql insertion method matching the CLI load method"""
+    if load_method == "copy":
+        return psql_insert_copy
+    elif load_method == "insert":
+        return None  # pandas default, one INSERT per row
+    else:
+        logging.error("Unknown load method: %s", load_method)
+        raise ValueError(f"Unknown load method '{load_method}', expected one of {LOAD_METHODS}")
+
+
+def pipelined_load(chunks, write_chunk, engine, writers=1, queue_depth=2, prepare=None, finalize=None):
+    """Parse chunks in the calling thread while writer threads load them, return rows loaded
+
+    The bounded queue gives backpressure: parsing blocks once queue_depth chunks
+    are waiting. Each writer loads over its own connection and transaction; the
+    writers wait for each other before committing, so if a writer or the parser
+    fails, every writer rolls back. prepare(conn), e.g. deleting the rows a
+    source loaded before, runs first on a connection of its own that commits
+    together with the writers. finalize(conn) runs on that connection once
+    every writer has loaded its last chunk, before any of them commits.
+    """
+    chunk_queue = queue.Queue(maxsize=queue_depth)
+    failed = threading.Event()
+    errors = []
+    rows_loaded = []
+
+    def finish():
+        # Barrier action, run by the last thread to arrive while the others wait
+        try:
+            finalize(conn)
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+            raise
+
+    # The writers, and the calling thread holding the prepare transaction
+    commit_barrier = threading.Barrier(writers + 1, action=finish if finalize else None)
+
+    def wait_to_commit():
+        try:
+            commit_barrier.wait()
+        except threading.BrokenBarrierError:
+            failed.set()
+        if failed.is_set():
+            raise RuntimeError("pipelined load failed, rolling back")
+
+    def writer():
+        rows = 0
+        drained = False
+        try:
+            with engine.begin() as conn:
+                while True:
+                    df = chunk_queue.get()
+                    if df is _DONE:
+                        drained = True
+                        break
+                    if failed.is_set():
+                        raise RuntimeError("another writer failed")  # roll back this transaction
+                    write_chunk(conn, df)
+                    rows += len(df)
+                # Commit only once every writer has loaded its last chunk without error
+                wait_to_commit()
+            rows_loaded.append(rows)
+        except Exception as e:
+            if not failed.is_set():
+                errors.append(e)
+            failed.set()
+            if not drained:
+                # Keep draining so the parser never blocks on a full queue
+                while chunk_queue.get() is not _DONE:
+                    pass
+                commit_barrier.abort()
+
+    with contextlib.ExitStack() as stack:
+        conn = stack.enter_context(engine.begin()) if prepare or finalize else None
+        if prepare:
+            prepare(conn)
+        threads = [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for df in chunks:
+                if failed.is_set():
+                    break
+                chunk_queue.put(df)
+        except BaseException:
+            # A parse error rolls the writers back too
+            failed.set()
+            commit_barrier.abort()
+            raise
+        finally:
+            for _ in threads:
+                chunk_queue.put(_DONE)
+            if not failed.is_set():
+                try:
+                    commit_barrier.wait()
+                except Exception:
+                    # Broken barrier, or finalize failed in this thread (recorded in errors)
+                    failed.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            logging.error("Pipelined load failed: %s", errors[0])
+            raise errors[0]
+        if failed.is_set():
+            raise RuntimeError("pipelined load failed, rolling back")
+    return sum(rows_loaded)
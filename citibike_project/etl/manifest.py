@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+
+
+## Declare global variables
+MANIFEST_PATH = "./data/citibike_data/manifest.sqlite"
+
+# sqlite allows a single writer, serialize the parallel workers
+_manifest_lock = threading.Lock()
+
+
+def _connect(manifest_path=MANIFEST_PATH):
+    """Open the manifest database and create the table on first use"""
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    conn = sqlite3.connect(manifest_path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_archives (
+            s3_key TEXT PRIMARY KEY,
+            etag TEXT,
+            size INTEGER,
+            extract_dir TEXT,
+            rows_loaded INTEGER,
+            loaded_at TEXT
+        )
+    """)
+    return conn
+
+
+def pending_objects(objects, manifest_path=MANIFEST_PATH):
+    """Return the listed objects that are new or changed since they were last loaded"""
+    with _manifest_lock:
+        conn = _connect(manifest_path)
+        try:
+            loaded = {key: (etag, size) for key, etag, size
+                      in conn.execute("SELECT s3_key, etag, size FROM ingested_archives")}
+        finally:
+            conn.close()
+
+    pending = [obj for obj in objects
+               if loaded.get(obj["key"]) != (obj["etag"], obj["size"])]
+    logging.info("Manifest: %s of %s archives are new or changed", len(pending), len(objects))
+    return pending
+
+
+def record_object(obj, extract_dir, rows_loaded, manifest_path=MANIFEST_PATH):
+    """Mark an archive as fully loaded, replacing any previous entry for the key"""
+    with _manifest_lock:
+        conn = _connect(manifest_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingested_archives VALUES (?, ?, ?, ?, ?, ?)",
+                    (obj["key"], obj["etag"], obj["size"], str(extract_dir), rows_loaded,
+                     datetime.now(timezone.utc).isoformat()),
+                )
+        finally:
+            conn.close()
+    logging.info("Manifest updated: %s (%s rows)", obj["key"], rows_loaded)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import numpy as np
+import pandas as pd
+
+
+## Declare global variables
+TRIPS_TABLE = "citibike_trips"
+
+# Canonical trip schema every layout is mapped onto, in column order
+# (compact types: float32 coordinates, categoricals for repeated strings, see compact.py)
+CANONICAL_DTYPES = {
+    "ride_id": "string",
+    "rideable_type": "category",
+    "started_at": "datetime64[ns]",
+    "ended_at": "datetime64[ns]",
+    "trip_duration_s": "float32",
+    "start_station_id": "category",
+    "start_station_name": "category",
+    "start_lat": "float32",
+    "start_lng": "float32",
+    "end_station_id": "category",
+    "end_station_name": "category",
+    "end_lat": "float32",
+    "end_lng": "float32",
+    "member_casual": "category",
+    "bike_id": "Int32",
+    "birth_year": "Int16",
+    "gender": "Int8",
+    "source_file": "category",
+}
+
+# Header aliases after lower-casing and replacing spaces with underscores:
+# legacy S3 csvs (2013-2021), their title-case 2016-2017 variant and the BigQuery table
+COLUMN_ALIASES = {
+    "starttime": "started_at",
+    "start_time": "started_at",
+    "stoptime": "ended_at",
+    "stop_time": "ended_at",
+    "tripduration": "trip_duration_s",
+    "trip_duration": "trip_duration_s",
+    "start_station_latitude": "start_lat",
+    "start_station_longitude": "start_lng",
+    "end_station_latitude": "end_lat",
+    "end_station_longitude": "end_lng",
+    "bikeid": "bike_id",
+    "usertype": "member_casual",
+    "user_type": "member_casual",
+}
+
+MEMBER_CASUAL = {"Subscriber": "member", "Customer": "casual", "member": "member", "casual": "casual"}
+GENDER = {"unknown": 0, "male": 1, "female": 2}
+
+
+def _header_key(name):
+    return "_".join(str(name).strip().lower().split())
+
+
+def canonical_frame():
+    """Empty frame with the canonical trip schema, used to create the target table"""
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in CANONICAL_DTYPES.items()})
+
+
+def normalize_chunk(df, source_file=None):
+    """Map a chunk of any Citi Bike layout onto the canonical trip schema with column operations"""
+    df = df.rename(columns=lambda name: COLUMN_ALIASES.get(_header_key(name), _header_key(name)))
+    out = pd.DataFrame(index=df.index)
+
+    for name, dtype in CANONICAL_DTYPES.items():
+        if name not in df.columns:
+            out[name] = pd.Series(index=df.index, dtype=dtype)
+            continue
+        column = df[name]
+        if name == "member_casual":
+            # Subscriber/Customer in legacy files, member/casual since 2021
+            column = column.astype("string").map(MEMBER_CASUAL)
+        elif name == "gender" and not pd.api.types.is_numeric_dtype(column):
+            # BigQuery spells gender out
+            column = column.astype("string").str.lower().map(GENDER)
+        elif name in ("started_at", "ended_at"):
+            column = pd.to_datetime(column)
+        elif dtype == "string" and isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype("string")
+        elif dtype == "category" and pd.api.types.is_numeric_dtype(column):
+            # Legacy station ids are numbers, the modern ones text like "5329.03";
+            # floats when a chunk has blanks, written without the ".0"
+            if pd.api.types.is_float_dtype(column) and (column.dropna() % 1 == 0).all():
+                column = column.astype("Int64")
+            column = column.astype("string")
+        elif dtype.startswith("Int") and pd.api.types.is_float_dtype(column):
+            # nullable ints come in as floats when a chunk has blanks (e.g. birth year)
+            column = column.round()
+        out[name] = column.astype(dtype)
+
+    # Modern files carry no duration, derive it from the timestamps
+    missing = out["trip_duration_s"].isna()
+    if missing.any():
+        durations = (out["ended_at"] - out["started_at"]).dt.total_seconds()
+        out["trip_duration_s"] = out["trip_duration_s"].where(~missing, durations)
+
+    if source_file:
+        out["source_file"] = pd.Categorical.from_codes(np.zeros(len(out), dtype=np.int8), categories=[source_file])
+    return out
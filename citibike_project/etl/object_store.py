@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import base64
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from parallel import run_bounded
+from instrumentation import timed
+
+try:
+    from google.cloud import storage
+except ImportError:  # only needed for the gcs sink
+    storage = None
+
+try:
+    from azure.storage.blob import BlobServiceClient, ContentSettings
+except ImportError:  # only needed for the azure sink
+    BlobServiceClient = None
+
+
+## Declare global variables
+SINKS = ["s3", "minio", "gcs", "azure"]
+PART_SIZE = 64 * 1024 * 1024  # multipart part / resumable chunk size
+MAX_CONCURRENCY = 8  # parts of one file uploaded at once
+READ_SIZE = 8 * 1024 * 1024
+MD5_METADATA = "md5"  # object metadata holding the hex md5 of the whole file
+
+
+def file_digests(path, part_size=PART_SIZE):
+    """Return (md5 hex, S3 ETag expected for a multipart upload with part_size parts) in one pass"""
+    whole = hashlib.md5()
+    part_digests = []
+    with open(path, "rb") as f:
+        while True:
+            part = hashlib.md5()
+            remaining = part_size
+            while remaining:
+                block = f.read(min(READ_SIZE, remaining))
+                if not block:
+                    break
+                whole.update(block)
+                part.update(block)
+                remaining -= len(block)
+            if remaining == part_size:
+                break
+            part_digests.append(part.digest())
+    if len(part_digests) <= 1:
+        return whole.hexdigest(), whole.hexdigest()
+    multipart = hashlib.md5(b"".join(part_digests)).hexdigest()
+    return whole.hexdigest(), f"{multipart}-{len(part_digests)}"
+
+
+class ObjectStoreSink(ABC):
+    """Uploads local files to an object store bucket, skipping objects whose content is unchanged
+
+    Files are uploaded concurrently (upload_files) and each large file in
+    parallel parts. The md5 of every file is stored with its object and
+    checked against what the store received; an object with the same md5
+    is not uploaded again. Backends implement _remote_md5 and _put.
+    """
+
+    name = None
+
+    def __init__(self, bucket, prefix="", part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+
+    def url(self, key):
+        return f"{self.name}://{self.bucket}/{key}"
+
+    def key_for(self, path, local_root=None):
+        """Object key of a local file: its path under local_root (or its name), below the sink prefix"""
+        relative = Path(path).relative_to(local_root).as_posix() if local_root else Path(path).name
+        return f"{self.prefix}/{relative}" if self.prefix else relative
+
+    def upload_file(self, path, key=None):
+        """Upload one file unless the object already holds the same content, return True if uploaded"""
+        key = key or self.key_for(path)
+        with timed("upload", file=Path(path).name) as metrics:
+            md5, multipart_etag = file_digests(path, self.part_size)
+            if self._remote_md5(key) == md5:
+                logging.info("Unchanged, skipping upload: %s", self.url(key))
+                metrics["skip"] = True
+                return False
+            self._put(path, key, md5, multipart_etag)
+            metrics["bytes"] = os.path.getsize(path)
+        logging.info("Uploaded %s to %s", path, self.url(key))
+        return True
+
+    def upload_files(self, files, local_root=None, workers=4):
+        """Upload files concurrently, return {path: uploaded}"""
+        return run_bounded(lambda path: self.upload_file(path, self.key_for(path, local_root)),
+                           [str(path) for path in files], workers=workers)
+
+    @abstractmethod
+    def _remote_md5(self, key):
+        """Hex md5 of the object's content, None if the object is missing or its md5 unknown"""
+
+    @abstractmethod
+    def _put(self, path, key, md5, multipart_etag):
+        """Upload path to key, failing if the store did not receive the same content"""
+
+
+class S3Sink(ObjectStoreSink):
+    """AWS S3, or any S3 compatible store such as MinIO when endpoint_url is set"""
+
+    name = "s3"
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, aws_access_key_id=None, aws_secret_access_key=None,
+                 part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+        super().__init__(bucket, prefix=prefix, part_size=part_size, max_concurrency=max_concurrency)
+        self.client = boto3.client("s3", endpoint_url=endpoint_url,
+                                   aws_access_key_id=aws_access_key_id,
+                                   aws_secret_access_key=aws_secret_access_key)
+        self.transfer_config = TransferConfig(multipart_threshold=part_size,
+                                              multipart_chunksize=part_size,
+                                              max_concurrency=max_concurrency)
+
+    def _remote_md5(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        etag = head["ETag"].strip('"')
+        # Single part objects: the ETag is the md5 of the content
+        return head.get("Metadata", {}).get(MD5_METADATA) or (etag if "-" not in etag else None)
+
+    def _put(self, path, key, md5, multipart_etag):
+        extra_args = {"Metadata": {MD5_METADATA: md5}}
+        if multipart_etag == md5:
+            # Single request: the store rejects a body not matching Content-MD5
+            with open(path, "rb") as f:
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=f,
+                                       ContentMD5=base64.b64encode(bytes.fromhex(md5)).decode(), **extra_args)
+            return
+        self.client.upload_file(str(path), self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+        etag = self.client.head_object(Bucket=self.bucket, Key=key)["ETag"].strip('"')
+        if etag != multipart_etag:
+            raise IOError(f"Upload of {path} to {self.url(key)} is corrupt: ETag {etag} != {multipart_etag}")
+
+
+class GCSSink(ObjectStoreSink):
+    """Google Cloud Storage, with resumable uploads of part_size chunks"""
+
+    name = "gs"
+
+    def __init__(self, bucket, prefix="", part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+        if storage is None:
+            raise ImportError("google-cloud-storage is required for the gcs sink")
+        super().__init__(bucket, prefix=prefix, part_size=part_size, max_concurrency=max_concurrency)
+        self.client = storage.Client()
+        self.bucket_ref = self.client.bucket(bucket)
+
+    def _remote_md5(self, key):
+        blob = self.bucket_ref.get_blob(key)
+        if blob is None:
+            return None
+        if blob.metadata and MD5_METADATA in blob.metadata:
+            return blob.metadata[MD5_METADATA]
+        # Objects uploaded by other tools still carry the md5 GCS computed (except composite ones)
+        return base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None
+
+    def _put(self, path, key, md5, multipart_etag):
+        # A chunk size makes the upload resumable, retried chunk by chunk
+        blob = self.bucket_ref.blob(key, chunk_size=self.part_size)
+        blob.metadata = {MD5_METADATA: md5}
+        # checksum="md5" fails the upload if GCS computed another md5
+        blob.upload_from_filename(str(path), checksum="md5")
+
+
+class AzureSink(ObjectStoreSink):
+    """Azure Blob Storage, blocks uploaded in parallel and validated with their md5"""
+
+    name = "azure"
+
+    def __init__(self, bucket, prefix="", connection_string=None, part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+        if BlobServiceClient is None:
+            raise ImportError("azure-storage-blob is required for the azure sink")
+        super().__init__(bucket, prefix=prefix, part_size=part_size, max_concurrency=max_concurrency)
+        connection_string = connection_string or os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+        self.container = BlobServiceClient.from_connection_string(
+            connection_string, max_block_size=part_size, max_single_put_size=part_size,
+        ).get_container_client(bucket)
+
+    def _remote_md5(self, key):
+        blob = self.container.get_blob_client(key)
+        if not blob.exists():
+            return None
+        content_md5 = blob.get_blob_properties().content_settings.content_md5
+        return bytes(content_md5).hex() if content_md5 else None
+
+    def _put(self, path, key, md5, multipart_etag):
+        with open(path, "rb") as f:
+            # validate_content sends an md5 with every block, content_md5 is kept for the skip check
+            self.container.get_blob_client(key).upload_blob(
+                f, overwrite=True, max_concurrency=self.max_concurrency, validate_content=True,
+                content_settings=ContentSettings(content_md5=bytearray(bytes.fromhex(md5))))
+
+
+def make_sink(kind, bucket, prefix="", **kwargs):
+    """Create the sink of a CLI sink kind; minio reads its endpoint and credentials from the environment"""
+    if kind == "minio":
+        return S3Sink(bucket, prefix=prefix,
+                      endpoint_url=os.environ.get("MINIO_ENDPOINT", "http://minio:9000"),
+                      aws_access_key_id=os.environ.get("MINIO_ROOT_USER"),
+                      aws_secret_access_key=os.environ.get("MINIO_ROOT_PASSWORD"), **kwargs)
+    if kind == "s3":
+        return S3Sink(bucket, prefix=prefix, **kwargs)
+    if kind == "gcs":
+        return GCSSink(bucket, prefix=prefix, **kwargs)
+    if kind == "azure":
+        return AzureSink(bucket, prefix=prefix, **kwargs)
+    logging.error("Unknown sink: %s", kind)
+    raise ValueError(f"Unknown sink '{kind}', expected one of {SINKS}")
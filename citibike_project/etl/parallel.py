@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def run_bounded(func, items, workers=4, max_inflight=None):
+    """Run func over items in a worker pool, keeping at most max_inflight tasks queued"""
+    max_inflight = max(max_inflight or workers * 2, workers)
+    results = {}
+    failed = []
+
+    def collect(futures):
+        for future in futures:
+            item = inflight.pop(future)
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                # Keep the other files going, report the failures at the end
+                logging.error("Processing failed for %s: %s", item, e)
+                failed.append(item)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        inflight = {}
+        for item in items:
+            # Backpressure: wait for a slot before submitting more work
+            if len(inflight) >= max_inflight:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done)
+            inflight[executor.submit(func, item)] = item
+        while inflight:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(failed) + len(results)} items failed: {failed}")
+    return results
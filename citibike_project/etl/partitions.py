@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import re
+import logging
+from datetime import date
+
+from sqlalchemy import text
+
+
+## Declare global variables
+# Postgres columns of the canonical trip schema (see normalize.CANONICAL_DTYPES)
+TRIPS_COLUMNS_DDL = """
+    ride_id TEXT,
+    rideable_type TEXT,
+    started_at TIMESTAMP NOT NULL,
+    ended_at TIMESTAMP,
+    trip_duration_s REAL,
+    start_station_id TEXT,
+    start_station_name TEXT,
+    start_lat REAL,
+    start_lng REAL,
+    end_station_id TEXT,
+    end_station_name TEXT,
+    end_lat REAL,
+    end_lng REAL,
+    member_casual TEXT,
+    bike_id INTEGER,
+    birth_year SMALLINT,
+    gender SMALLINT,
+    source_file TEXT
+"""
+
+# Station columns replaced by surrogate keys into the stations dimension (see stations.py)
+STATION_COLUMNS_DDL = {
+    "start_station_id TEXT,\n    start_station_name TEXT,": "start_station_key INTEGER,",
+    "end_station_id TEXT,\n    end_station_name TEXT,": "end_station_key INTEGER,",
+}
+
+# Indexes declared on the parent and built on each partition after its load
+TRIPS_INDEXES = {
+    "started_at": "(started_at)",
+    "start_station": "(start_station_id, started_at)",
+}
+KEYED_TRIPS_INDEXES = {
+    "started_at": "(started_at)",
+    "start_station": "(start_station_key, started_at)",
+}
+
+
+def trips_columns_ddl(station_keys=False):
+    """Column DDL of the trips table, with station surrogate keys instead of ids and names if asked"""
+    ddl = TRIPS_COLUMNS_DDL
+    if station_keys:
+        for columns, key in STATION_COLUMNS_DDL.items():
+            ddl = ddl.replace(columns, key)
+    return ddl
+
+
+def trips_indexes(station_keys=False):
+    return KEYED_TRIPS_INDEXES if station_keys else TRIPS_INDEXES
+
+
+def month_bounds(year, month):
+    """Return the [start, end) dates of a month partition"""
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def partition_name(table, year, month):
+    return f"{table}_{year}{month:02d}"
+
+
+def owned_months(source_file):
+    """Months an archive is authoritative for, from its name (202401-... or yearly 2013-...)"""
+    match = re.search(r"(20\d{2})(\d{2})?", source_file or "")
+    if not match:
+        return None
+    year = int(match.group(1))
+    if match.group(2):
+        return {(year, int(match.group(2)))}
+    return {(year, month) for month in range(1, 13)}
+
+
+def create_partitioned_table(engine, table, station_keys=False):
+    """Create the range-partitioned trips table and its partitioned indexes if missing"""
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table} ({trips_columns_ddl(station_keys)}) "
+                          f"PARTITION BY RANGE (started_at)"))
+        for suffix, columns in trips_indexes(station_keys).items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_{suffix}_idx ON {table} {columns}"))
+
+
+def _exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+
+def _ensure_partition(conn, table, year, month):
+    """Create an empty partition so rows routed through the parent have somewhere to go"""
+    name = partition_name(table, year, month)
+    if not _exists(conn, name):
+        start, end = month_bounds(year, month)
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} "
+                          f"FOR VALUES FROM ('{start}') TO ('{end}')"))
+
+
+def _swap_in(conn, table, staging, year, month, source_file, station_keys=False):
+    """Index a loaded staging table and attach it in place of the month's current partition"""
+    name = partition_name(table, year, month)
+    start, end = month_bounds(year, month)
+
+    if _exists(conn, name):
+        # Keep boundary trips other archives routed into this month
+        conn.execute(text(f"INSERT INTO {staging} SELECT * FROM {name} "
+                          f"WHERE source_file IS DISTINCT FROM :source_file"),
+                     {"source_file": source_file})
+
+    # Deferred index and constraint build, once on the full month instead of per row
+    for columns in trips_indexes(station_keys).values():
+        conn.execute(text(f"CREATE INDEX ON {staging} {columns}"))
+    # The matching CHECK lets ATTACH PARTITION skip its validation scan
+    conn.execute(text(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_range_check "
+                      f"CHECK (started_at >= '{start}' AND started_at < '{end}')"))
+    conn.execute(text(f"ANALYZE {staging}"))
+
+    if _exists(conn, name):
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"ALTER TABLE {staging} RENAME TO {name}"))
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                      f"FOR VALUES FROM ('{start}') TO ('{end}')"))
+    logging.info("Partition swapped in: %s", name)
+
+
+def _clear_boundary_rows(conn, table, source_file, owned):
+    """Delete the rows a previous load of source_file routed into months it does not own"""
+    start = month_bounds(*min(owned))[0]
+    end = month_bounds(*max(owned))[1]
+    # Owned months are contiguous, the range condition prunes them from the scan
+    conn.execute(text(f"DELETE FROM {table} WHERE source_file = :source_file "
+                      f"AND (started_at < '{start}' OR started_at >= '{end}')"),
+                 {"source_file": source_file})
+
+
+def load_partitioned(engine, table, chunks, source_file, to_sql_method=None, station_keys=False, demand=None):
+    """Load canonical trip chunks of one archive into fresh month partitions and swap them in
+
+    demand (a features.HourlyDemand) is updated with every chunk in the same transaction.
+    The months load into staging tables without touching the parent table, which is
+    only locked for the boundary rows and the swap: archives load in parallel and
+    swap in one at a time.
+    """
+    owned = owned_months(source_file)
+    stagings = {}
+    boundary = {}
+    rows_loaded = 0
+
+    # One transaction per archive: readers see the old months until the swap commits
+    with engine.begin() as conn:
+        if demand is not None:
+            demand.clear(conn, source_file)
+        for chunk, df in enumerate(chunks):
+            df = df[df["started_at"].notna()]
+            if demand is not None:
+                demand.merge(conn, df, source_file=source_file, chunk=chunk)
+            month_keys = df["started_at"].dt.year * 100 + df["started_at"].dt.month
+            for key, part in df.groupby(month_keys):
+                year, month = divmod(int(key), 100)
+                if owned is None or (year, month) in owned:
+                    if (year, month) not in stagings:
+                        # Fresh table without indexes or constraints for the bulk load,
+                        # declared rather than LIKE {table}, which would lock the parent until commit
+                        staging = f"{partition_name(table, year, month)}_load"
+                        conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+                        conn.execute(text(f"CREATE TABLE {staging} ({trips_columns_ddl(station_keys)})"))
+                        stagings[(year, month)] = staging
+                    part.to_sql(stagings[(year, month)], conn, if_exists="append", index=False, method=to_sql_method)
+                else:
+                    # Trips starting in a neighbouring month go through the parent, once it is locked
+                    boundary.setdefault((year, month), []).append(part)
+                rows_loaded += len(part)
+
+        # Held until commit: concurrent archives would each write to the parent, then
+        # wait on each other's lock to detach or attach their partitions and deadlock
+        conn.execute(text(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE"))
+        if owned is not None:
+            # Re-loading the archive routes its boundary trips through the parent again
+            _clear_boundary_rows(conn, table, source_file, owned)
+        for (year, month), parts in sorted(boundary.items()):
+            _ensure_partition(conn, table, year, month)
+            for part in parts:
+                part.to_sql(table, conn, if_exists="append", index=False, method=to_sql_method)
+
+        for (year, month), staging in sorted(stagings.items()):
+            _swap_in(conn, table, staging, year, month, source_file, station_keys=station_keys)
+
+    return rows_loaded
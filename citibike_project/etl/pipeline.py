@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import asyncio
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+
+## Declare global variables
+# Network stages overlap on many threads, CPU stages get about one thread per core
+DEFAULT_STAGE_LIMITS = {
+    "listing": 1,
+    "download": 4,
+    "extract": max(1, (os.cpu_count() or 1) // 2),
+    "load": 2,
+    "finish": 2,
+    "compress": max(1, (os.cpu_count() or 1) // 2),
+    "bigquery": 1,
+}
+
+
+def parse_stage_limits(value):
+    """Parse 'download=8,load=4' into stage limits, on top of the defaults"""
+    limits = dict(DEFAULT_STAGE_LIMITS)
+    for item in filter(None, (value or "").split(",")):
+        stage, _, limit = item.partition("=")
+        if stage.strip() not in limits or not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError(f"Invalid stage limit '{item}', expected <stage>=<n> with stage in {list(limits)}")
+        limits[stage.strip()] = int(limit)
+    return limits
+
+
+class AsyncPipeline:
+    """Runs the blocking ETL functions as asyncio stages, each with its own concurrency limit
+
+    The event loop only schedules: every stage call runs on the stage's own
+    thread pool, so a slow stage (e.g. the database) never starves another one
+    (e.g. the downloads). The zip inflate, arrow parsing and compression
+    codecs release the GIL, so CPU stages scale over cores in threads.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_STAGE_LIMITS, **(limits or {}))
+        self.executors = {}
+        self.semaphores = {}
+
+    async def run(self, stage, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in the given stage, waiting for a free slot"""
+        if stage not in self.semaphores:
+            # Created lazily so they bind to the running loop
+            self.semaphores[stage] = asyncio.Semaphore(self.limits.get(stage, 1))
+            self.executors[stage] = ThreadPoolExecutor(max_workers=self.limits.get(stage, 1),
+                                                       thread_name_prefix=f"stage-{stage}")
+        async with self.semaphores[stage]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executors[stage], partial(func, *args, **kwargs))
+
+    async def gather(self, coroutines, names):
+        """Await coroutines concurrently, log failures and raise once all are done (like run_bounded)"""
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        failed = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logging.error("Processing failed for %s: %s", name, result)
+                failed.append(name)
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(results)} items failed: {failed}")
+        return dict(zip(names, results))
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+        self.executors.clear()
+        self.semaphores.clear()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import json
+import logging
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+from time import time
+
+import requests
+
+
+## Declare global variables
+LISTING_CACHE_PATH = "./data/citibike_data/listing_cache.json"
+LISTING_CACHE_TTL = 3600  # seconds
+
+
+def _local(tag):
+    """Strip the S3 xml namespace from a tag"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_listing_page(stream):
+    """Incrementally parse one ListBucketResult page, return (objects, is_truncated, next_marker)"""
+    objects = []
+    is_truncated = False
+    next_marker = None
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        tag = _local(elem.tag)
+        if tag == "Contents":
+            record = {_local(child.tag): child.text for child in elem}
+            objects.append({"key": record.get("Key"),
+                            "size": int(record["Size"]) if record.get("Size") else None,
+                            "etag": record["ETag"].strip('"') if record.get("ETag") else None,
+                            "last_modified": record.get("LastModified")})
+            elem.clear()  # keep memory flat on large pages
+        elif tag == "IsTruncated":
+            is_truncated = elem.text == "true"
+        elif tag in ("NextMarker", "NextContinuationToken"):
+            next_marker = elem.text
+    return objects, is_truncated, next_marker
+
+
+def list_bucket(base_url, suffix=".zip", session=None, timeout=60):
+    """Follow S3 ListObjects pagination and return every key with size, ETag and LastModified"""
+    session = session or requests.Session()
+    objects = []
+    marker = None
+    page = 0
+    while True:
+        params = {"marker": marker} if marker else {}
+        with session.get(base_url, params=params, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            page_objects, is_truncated, next_marker = _parse_listing_page(response.raw)
+        objects.extend(page_objects)
+        page += 1
+        if not is_truncated or not page_objects:
+            break
+        # ListObjects v1 only returns NextMarker with a delimiter, otherwise use the last key
+        marker = next_marker or page_objects[-1]["key"]
+
+    logging.info("Listed %s objects in %s pages from %s", len(objects), page, base_url)
+    return [dict(obj, url=urljoin(base_url, obj["key"])) for obj in objects
+            if obj["key"] and obj["key"].endswith(suffix)]
+
+
+def cached_list_bucket(base_url, cache_path=LISTING_CACHE_PATH, ttl=LISTING_CACHE_TTL, session=None):
+    """Return the bucket listing from a local cache file if younger than ttl seconds"""
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache["base_url"] == base_url and time() - cache["listed_at"] < ttl:
+            logging.info("Using cached listing from %s", cache_path)
+            return cache["objects"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    objects = list_bucket(base_url, session=session)
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    with open(cache_path, "w") as f:
+        json.dump({"base_url": base_url, "listed_at": time(), "objects": objects}, f)
+    return objects
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import io
+import logging
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+
+## Declare global variables
+PARSERS = ["pandas", "arrow"]
+ARROW_BLOCK_SIZE = 8 * 1024 * 1024  # bytes per arrow read block
+
+# Blanks of the 2013-2014 legacy months are written as \N, on top of arrow's defaults
+NULL_VALUES = pa_csv.ConvertOptions().null_values + ["\\N"]
+
+# Low-cardinality text columns are dictionary encoded, they arrive in pandas as categoricals
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Current layout, from 2021-02 onwards
+MODERN_SCHEMA = {
+    "ride_id": pa.string(),
+    "rideable_type": CATEGORY,
+    "started_at": pa.timestamp("ms"),
+    "ended_at": pa.timestamp("ms"),
+    "start_station_name": CATEGORY,
+    "start_station_id": CATEGORY,
+    "end_station_name": CATEGORY,
+    "end_station_id": CATEGORY,
+    "start_lat": pa.float64(),
+    "start_lng": pa.float64(),
+    "end_lat": pa.float64(),
+    "end_lng": pa.float64(),
+    "member_casual": CATEGORY,
+}
+
+# Legacy layout, 2013 to 2021-01, keyed by lower-cased header
+# (2016-2017 files spell the same columns in title case, e.g. "Start Time")
+LEGACY_SCHEMA = {
+    "tripduration": pa.int64(),
+    "trip duration": pa.int64(),
+    "starttime": pa.timestamp("ms"),
+    "start time": pa.timestamp("ms"),
+    "stoptime": pa.timestamp("ms"),
+    "stop time": pa.timestamp("ms"),
+    "start station id": CATEGORY,
+    "start station name": CATEGORY,
+    "start station latitude": pa.float64(),
+    "start station longitude": pa.float64(),
+    "end station id": CATEGORY,
+    "end station name": CATEGORY,
+    "end station latitude": pa.float64(),
+    "end station longitude": pa.float64(),
+    "bikeid": pa.int64(),
+    "bike id": pa.int64(),
+    "usertype": CATEGORY,
+    "user type": CATEGORY,
+    "birth year": pa.float64(),  # blank in some months
+    "gender": pa.int8(),
+}
+
+# Legacy files mix ISO timestamps and US-style dates with or without seconds
+TIMESTAMP_PARSERS = [pa_csv.ISO8601, "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M"]
+
+# Columns the pandas parser types itself, by lower-cased header: the trip times of
+# every layout are parsed as dates, station ids kept as text
+TIMESTAMP_COLUMNS = {name for schema in (MODERN_SCHEMA, LEGACY_SCHEMA)
+                     for name, arrow_type in schema.items() if arrow_type == pa.timestamp("ms")}
+STATION_ID_COLUMNS = {"start_station_id", "end_station_id", "start station id", "end station id"}
+
+
+def detect_layout(header):
+    """Return 'modern' or 'legacy' from the list of csv header names"""
+    names = {name.strip().lower() for name in header}
+    if "started_at" in names:
+        return "modern"
+    if names & {"starttime", "start time"}:
+        return "legacy"
+    raise ValueError(f"Unknown Citi Bike csv layout: {header}")
+
+
+def column_types_for(header):
+    """Map the actual header names of a file to their declared arrow types"""
+    schema = MODERN_SCHEMA if detect_layout(header) == "modern" else LEGACY_SCHEMA
+    return {name: schema[name.strip().lower()] for name in header
+            if name.strip().lower() in schema}
+
+
+def _open_buffered(source):
+    """Open a path or wrap a file object so its header can be peeked without consuming it"""
+    if hasattr(source, "read"):
+        return io.BufferedReader(source, buffer_size=1024 * 1024)
+    return open(source, "rb", buffering=1024 * 1024)
+
+
+def _peek_header(stream):
+    """Header names of a buffered csv stream, left unconsumed"""
+    header_line = stream.peek(64 * 1024).split(b"\n", 1)[0].decode("utf-8-sig").strip()
+    return [name.strip('"') for name in header_line.split(",")]
+
+
+def iter_csv_batches(source, block_size=ARROW_BLOCK_SIZE):
+    """Parse a Citi Bike csv with pyarrow and the declared schema, yield arrow record batches"""
+    stream = _open_buffered(source)
+    try:
+        header = _peek_header(stream)
+        reader = pa_csv.open_csv(
+            stream,
+            read_options=pa_csv.ReadOptions(block_size=block_size),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types_for(header),
+                                                  timestamp_parsers=TIMESTAMP_PARSERS,
+                                                  null_values=NULL_VALUES,
+                                                  strings_can_be_null=True),
+        )
+        logging.info("Parsing %s layout with arrow", detect_layout(header))
+        yield from reader
+    finally:
+        stream.close()
+
+
+def read_csv_chunks(source, chunksize=200000, block_size=ARROW_BLOCK_SIZE):
+    """Parse a Citi Bike csv with pyarrow and the declared schema, yield pandas chunks of about chunksize rows
+
+    chunksize can be a callable (e.g. a chunking.ChunkSizer), read again before every chunk.
+    """
+    # Arrow reads fixed-size blocks, regroup them into row chunks for the loader
+    batches, rows = [], 0
+    for batch in iter_csv_batches(source, block_size=block_size):
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= (chunksize() if callable(chunksize) else chunksize):
+            yield pa.Table.from_batches(batches).to_pandas()
+            batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches).to_pandas()
+
+
+def read_pandas_chunks(source, chunksize=200000):
+    """Parse a Citi Bike csv with pandas (inferred dtypes), yield chunks of chunksize rows
+
+    Only the time columns of the file's own layout are parsed as dates, station
+    ids are kept as text (a float would turn "6140.10" into 6140.1).
+    chunksize can be a callable (e.g. a chunking.ChunkSizer), read again before every chunk.
+    """
+    stream = _open_buffered(source)
+    try:
+        header = _peek_header(stream)
+        parse_dates = [name for name in header if name.strip().lower() in TIMESTAMP_COLUMNS]
+        station_ids = {name: "string" for name in header if name.strip().lower() in STATION_ID_COLUMNS}
+        with pd.read_csv(stream, chunksize=chunksize() if callable(chunksize) else chunksize,
+                         parse_dates=parse_dates, dtype=station_ids, na_values=["\\N"]) as reader:
+            while True:
+                try:
+                    yield reader.get_chunk(chunksize() if callable(chunksize) else chunksize)
+                except StopIteration:
+                    return
+    finally:
+        stream.close()
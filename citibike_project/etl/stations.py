@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+
+## Declare global variables
+STATIONS_TABLE = "stations"
+
+# Fact columns replaced by a surrogate key; trip coordinates stay on the fact
+# (dockless e-bike trips carry their own GPS position, not the station's)
+STATION_ENDS = {
+    "start_station_key": ("start_station_id", "start_station_name", "start_lat", "start_lng"),
+    "end_station_key": ("end_station_id", "end_station_name", "end_lat", "end_lng"),
+}
+
+
+class StationIndex:
+    """In-memory hash index of stations across chunks and files, backing the stations dimension
+
+    Stations are keyed by (station id, station name) and get a stable integer
+    surrogate key from the table's identity column, so loads running in other
+    processes never hand out the same key. New stations are written to the
+    stations table as soon as they are seen, before the fact rows that
+    reference them (thread-safe), over a connection of their own checked out by load().
+    """
+
+    def __init__(self, engine, table=STATIONS_TABLE):
+        self.engine = engine
+        self.table = table
+        self.conn = None
+        self.keys = {}
+        self._lock = threading.Lock()
+
+    def create(self):
+        """Create the stations table if missing, one row per (station id, station name)"""
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    station_key INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    station_id TEXT,
+                    station_name TEXT,
+                    lat REAL,
+                    lng REAL,
+                    UNIQUE NULLS NOT DISTINCT (station_id, station_name)
+                )
+            """))
+        return self
+
+    def _read_keys(self, conn):
+        rows = conn.execute(text(f"SELECT station_key, station_id, station_name FROM {self.table}"))
+        self.keys.update({(station_id, station_name): station_key for station_key, station_id, station_name in rows})
+
+    def load(self):
+        """Index the stations of previous runs"""
+        with self.engine.begin() as conn:
+            self._read_keys(conn)
+        # Reserved for the inserts: loaders encode while holding pool connections,
+        # waiting under the lock for a free one could stall all of them
+        self.conn = self.engine.connect()
+        logging.info("Station index loaded: %s stations", len(self.keys))
+        return self
+
+    def _register(self, new_rows):
+        """Insert stations not indexed yet and index the keys the table gave them"""
+        # Own transaction: the keys must exist even if this chunk's load rolls back and is retried.
+        # Another process may have registered the same stations, its keys are kept
+        with self.conn.begin():
+            self.conn.execute(text(f"INSERT INTO {self.table} (station_id, station_name, lat, lng) "
+                                   f"VALUES (:station_id, :station_name, :lat, :lng) "
+                                   f"ON CONFLICT (station_id, station_name) DO NOTHING"), new_rows)
+            # The whole dimension is a few thousand rows, re-read it with the other processes' stations
+            self._read_keys(self.conn)
+        logging.info("Stations dimension: %s new stations (%s total)", len(new_rows), len(self.keys))
+
+    def _lookup(self, ids, names, lats, lngs):
+        """Return the surrogate key of every row, registering the stations not seen before"""
+        id_codes, id_uniques = pd.factorize(ids, use_na_sentinel=True)
+        name_codes, name_uniques = pd.factorize(names, use_na_sentinel=True)
+        # One integer per (id, name) pair, hashed once per distinct pair instead of per row
+        pairs = (id_codes.astype(np.int64) + 1) * (len(name_uniques) + 1) + (name_codes + 1)
+        unique_pairs, first_rows, inverse = np.unique(pairs, return_index=True, return_inverse=True)
+
+        stations = []
+        for pair in unique_pairs:
+            id_code, name_code = divmod(int(pair), len(name_uniques) + 1)
+            stations.append((str(id_uniques[id_code - 1]) if id_code else None,
+                             str(name_uniques[name_code - 1]) if name_code else None))
+
+        with self._lock:
+            new_rows = [{"station_id": station[0], "station_name": station[1],
+                         "lat": None if np.isnan(lats[row]) else float(lats[row]),
+                         "lng": None if np.isnan(lngs[row]) else float(lngs[row])}
+                        for station, row in zip(stations, first_rows)
+                        if station != (None, None) and station not in self.keys]
+            if new_rows:
+                self._register(new_rows)
+            # No station (dockless trip) has no key
+            station_keys = np.array([self.keys[station] if station != (None, None) else np.nan
+                                     for station in stations], dtype=np.float64)
+
+        return pd.array(station_keys[inverse], dtype="Int32")
+
+    def encode(self, df):
+        """Replace the station id and name columns of canonical trips with surrogate keys"""
+        out = df.copy(deep=False)
+        for key_column, (id_column, name_column, lat_column, lng_column) in STATION_ENDS.items():
+            keys = self._lookup(df[id_column], df[name_column], df[lat_column].to_numpy(), df[lng_column].to_numpy())
+            position = out.columns.get_loc(id_column)
+            out = out.drop(columns=[id_column, name_column])
+            out.insert(position, key_column, pd.Series(keys, index=df.index))
+        return out
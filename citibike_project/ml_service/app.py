@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import glob
+import asyncio
+import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import List
+
+import joblib
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+
+## Declare global variables
+MODEL_PATH = os.environ.get("MODEL_PATH", "models/demand_model.joblib")
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 512))  # single requests coalesced into one predict call
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 5))  # latency added to a lone request at most
+MAX_BATCH_REQUEST = int(os.environ.get("MAX_BATCH_REQUEST", 100_000))
+
+# Features the model is trained on, derived from (station, hour) only
+FEATURE_COLUMNS = ["station_id", "hour_of_day", "day_of_week", "month", "is_weekend"]
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s")
+
+
+class DemandQuery(BaseModel):
+    station_id: str = Field(..., description="station id as in the trips tables")
+    hour: datetime = Field(..., description="start of the hour bucket to predict departures for")
+
+
+class DemandPrediction(BaseModel):
+    station_id: str
+    hour: datetime
+    demand: float
+
+
+class BatchRequest(BaseModel):
+    queries: List[DemandQuery]
+
+
+class BatchResponse(BaseModel):
+    predictions: List[DemandPrediction]
+
+
+def find_model_path(path=MODEL_PATH):
+    """Return the configured model file, or the only joblib file in its directory"""
+    if os.path.exists(path):
+        return path
+    candidates = sorted(glob.glob(os.path.join(os.path.dirname(path) or ".", "*.joblib")))
+    if len(candidates) != 1:
+        raise FileNotFoundError(f"Model not found at {path} ({len(candidates)} joblib files next to it)")
+    return candidates[0]
+
+
+def build_features(queries):
+    """One feature row per query, as a single frame so the model scores them in one vectorized call"""
+    # Trips are in naive local NYC time: an offset is dropped, not converted to UTC
+    hours = pd.DatetimeIndex([pd.Timestamp(query.hour).tz_localize(None) for query in queries])
+    return pd.DataFrame({
+        # Plain strings: categories of one batch would give a station different codes per batch
+        "station_id": pd.Series([query.station_id for query in queries], dtype=object),
+        "hour_of_day": hours.hour,
+        "day_of_week": hours.dayofweek,
+        "month": hours.month,
+        "is_weekend": (hours.dayofweek >= 5).astype(int),
+    })
+
+
+def predict_demand(model, queries):
+    """Score all queries with one model.predict call"""
+    if not queries:
+        return []
+    features = build_features(queries)
+    # Models fitted on a DataFrame know their columns and order
+    columns = list(getattr(model, "feature_names_in_", FEATURE_COLUMNS))
+    demand = model.predict(features[columns])
+    return [DemandPrediction(station_id=query.station_id, hour=query.hour, demand=float(value))
+            for query, value in zip(queries, demand)]
+
+
+class MicroBatcher:
+    """Coalesces concurrent single predictions into one model call
+
+    Requests wait at most max_wait_ms for others to join their batch; a batch
+    is scored as soon as it holds max_size queries. Scoring runs in a worker
+    thread so the event loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, predict, max_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.predict = predict
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, query):
+        """Queue one query and wait for its prediction"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for a first query, then gather more until the batch is full or the wait is over"""
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            queries = [query for query, _ in batch]
+            try:
+                predictions = await asyncio.to_thread(self.predict, queries)
+            except Exception as e:
+                logging.error("Batch of %s predictions failed: %s", len(batch), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():  # the client may have disconnected
+                    future.set_result(prediction)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the model once and keep it warm for every request
+    path = find_model_path()
+    app.state.model = joblib.load(path)
+    logging.info("Loaded demand model from %s", path)
+    app.state.batcher = MicroBatcher(lambda queries: predict_demand(app.state.model, queries))
+    await app.state.batcher.start()
+    try:
+        yield
+    finally:
+        await app.state.batcher.stop()
+
+
+app = FastAPI(title="Citibike station demand", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "model": type(app.state.model).__name__}
+
+
+@app.post("/predict", response_model=DemandPrediction)
+async def predict(query: DemandQuery):
+    """Predict one (station, hour); concurrent calls are scored together"""
+    return await app.state.batcher.submit(query)
+
+
+@app.post("/predict/batch", response_model=BatchResponse)
+async def predict_batch(request: BatchRequest):
+    """Predict many (station, hour) pairs in one vectorized model call"""
+    if len(request.queries) > MAX_BATCH_REQUEST:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_REQUEST} queries per batch")
+    predictions = await asyncio.to_thread(predict_demand, app.state.model, request.queries)
+    return BatchResponse(predictions=predictions)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import logging
+import argparse
+from functools import partial
+from collections import defaultdict
+
+from pyspark import StorageLevel
+from pyspark.sql import SparkSession, functions as F, types as T
+from pyspark.sql.utils import AnalysisException
+
+
+## Declare global variables
+INPUT_DIR = "./data/citibike_data/unzipped_files"
+OUTPUT_DIR = "./data/citibike_data/spark"
+FORMATS = ["iceberg", "parquet"]
+
+# Canonical trip schema, the Spark counterpart of etl/normalize.py CANONICAL_DTYPES
+CANONICAL_SCHEMA = [
+    ("ride_id", T.StringType()),
+    ("rideable_type", T.StringType()),
+    ("started_at", T.TimestampType()),
+    ("ended_at", T.TimestampType()),
+    ("trip_duration_s", T.FloatType()),
+    ("start_station_id", T.StringType()),
+    ("start_station_name", T.StringType()),
+    ("start_lat", T.FloatType()),
+    ("start_lng", T.FloatType()),
+    ("end_station_id", T.StringType()),
+    ("end_station_name", T.StringType()),
+    ("end_lat", T.FloatType()),
+    ("end_lng", T.FloatType()),
+    ("member_casual", T.StringType()),
+    ("bike_id", T.IntegerType()),
+    ("birth_year", T.ShortType()),
+    ("gender", T.ByteType()),
+    ("source_file", T.StringType()),
+]
+
+# Header aliases after lower-casing and replacing spaces with underscores (as in etl/normalize.py)
+COLUMN_ALIASES = {
+    "starttime": "started_at",
+    "start_time": "started_at",
+    "stoptime": "ended_at",
+    "stop_time": "ended_at",
+    "tripduration": "trip_duration_s",
+    "trip_duration": "trip_duration_s",
+    "start_station_latitude": "start_lat",
+    "start_station_longitude": "start_lng",
+    "end_station_latitude": "end_lat",
+    "end_station_longitude": "end_lng",
+    "bikeid": "bike_id",
+    "usertype": "member_casual",
+    "user_type": "member_casual",
+}
+
+MEMBER_CASUAL = {"Subscriber": "member", "Customer": "casual", "member": "member", "casual": "casual"}
+GENDER = {"unknown": 0, "male": 1, "female": 2}
+
+# Timestamp layouts seen across the years: ISO (with or without fractions) and US dates of 2014-2016
+TIMESTAMP_FORMATS = ["M/d/yyyy H:mm:ss", "M/d/yyyy H:mm"]
+
+
+def header_key(name):
+    return "_".join(name.strip().strip('"').lower().split())
+
+
+def canonical_name(name):
+    key = header_key(name)
+    return COLUMN_ALIASES.get(key, key)
+
+
+def create_spark_session(master, app_name="citibike-backfill", warehouse=None, catalog="iceberg"):
+    """Spark session for the cluster or local[*]; the Iceberg catalog comes from spark-defaults.conf unless a warehouse is given"""
+    builder = (SparkSession.builder
+               .master(master)
+               .appName(app_name)
+               # Re-running a month replaces that month only
+               .config("spark.sql.sources.partitionOverwriteMode", "dynamic")
+               # Timestamps not matching a format become null instead of failing the job
+               .config("spark.sql.legacy.timeParserPolicy", "CORRECTED"))
+    if warehouse:
+        # Local runs: a hadoop catalog on a directory (the iceberg-spark-runtime jar must be on the classpath)
+        builder = (builder
+                   .config("spark.sql.extensions", "org.apache.iceberg.spark.extensions.IcebergSparkSessionExtensions")
+                   .config(f"spark.sql.catalog.{catalog}", "org.apache.iceberg.spark.SparkCatalog")
+                   .config(f"spark.sql.catalog.{catalog}.type", "hadoop")
+                   .config(f"spark.sql.catalog.{catalog}.warehouse", warehouse))
+    return builder.getOrCreate()
+
+
+def list_csv_headers(spark, input_path):
+    """Return {csv path: header line} for every trip csv under input_path (local, s3a or hdfs)"""
+    jvm = spark.sparkContext._jvm
+    hadoop_conf = spark.sparkContext._jsc.hadoopConfiguration()
+    root = jvm.org.apache.hadoop.fs.Path(input_path)
+    fs = root.getFileSystem(hadoop_conf)
+
+    headers = {}
+    files = fs.listFiles(root, True)
+    while files.hasNext():
+        path = files.next().getPath()
+        name = path.toString()
+        if not name.endswith(".csv") or "__MACOSX" in name:
+            continue
+        # Only the first line is read, on the driver
+        reader = jvm.java.io.BufferedReader(jvm.java.io.InputStreamReader(fs.open(path), "UTF-8"))
+        try:
+            headers[name] = (reader.readLine() or "").lstrip("\ufeff")
+        finally:
+            reader.close()
+    return dict(sorted(headers.items()))
+
+
+def group_by_layout(headers):
+    """Group csv paths sharing a header, so each group is read with one schema"""
+    layouts = defaultdict(list)
+    for path, header in headers.items():
+        layouts[tuple(canonical_name(name) for name in header.split(","))].append(path)
+    return layouts
+
+
+def parse_timestamp(column):
+    return F.coalesce(F.to_timestamp(column), *[F.to_timestamp(column, fmt) for fmt in TIMESTAMP_FORMATS])
+
+
+def mapping(values):
+    return F.create_map(*[F.lit(item) for pair in values.items() for item in pair])
+
+
+def normalize_trips(df):
+    """Map a DataFrame of one raw layout (all string columns) onto the canonical trip schema"""
+    df = df.toDF(*[canonical_name(name) for name in df.columns])
+    columns = []
+    for name, data_type in CANONICAL_SCHEMA:
+        if name == "source_file":
+            # The csv each row was read from, like the ETL's source_file
+            column = F.regexp_extract(F.input_file_name(), r"([^/]+)$", 1)
+        elif name not in df.columns:
+            column = F.lit(None).cast(data_type)
+        elif name in ("started_at", "ended_at"):
+            column = parse_timestamp(F.col(name))
+        elif name == "member_casual":
+            # Subscriber/Customer in legacy files, member/casual since 2021
+            column = mapping(MEMBER_CASUAL)[F.col(name)]
+        elif name == "gender":
+            # Numeric in the S3 csvs, spelled out in BigQuery exports
+            column = F.coalesce(F.col(name).cast(data_type),
+                                mapping(GENDER)[F.lower(F.col(name))].cast(data_type))
+        elif name in ("bike_id", "birth_year"):
+            # Blanks and "\N" become nulls, "1980.0" style floats are rounded
+            column = F.round(F.col(name).cast(T.DoubleType())).cast(data_type)
+        else:
+            column = F.col(name).cast(data_type)
+        columns.append(column.alias(name))
+    trips = df.select(*columns)
+
+    # Modern files carry no duration, derive it from the timestamps
+    derived = (F.unix_timestamp("ended_at") - F.unix_timestamp("started_at")).cast(T.FloatType())
+    return trips.withColumn("trip_duration_s", F.coalesce(F.col("trip_duration_s"), derived))
+
+
+def read_trips(spark, input_path):
+    """Read every raw trip csv under input_path as one canonical DataFrame with year/month columns"""
+    layouts = group_by_layout(list_csv_headers(spark, input_path))
+    if not layouts:
+        raise FileNotFoundError(f"No trip csv files under {input_path}")
+
+    trips = None
+    for header, paths in layouts.items():
+        logging.info("Reading %s csv files with columns %s", len(paths), list(header))
+        # All strings: parsing is done once per layout by normalize_trips, not inferred per file
+        schema = T.StructType([T.StructField(name, T.StringType()) for name in header])
+        raw = spark.read.csv(paths, header=True, schema=schema, enforceSchema=True, mode="PERMISSIVE")
+        layout_trips = normalize_trips(raw)
+        trips = layout_trips if trips is None else trips.unionByName(layout_trips)
+
+    return (trips
+            .where(F.col("started_at").isNotNull())
+            .withColumn("year", F.year("started_at").cast(T.ShortType()))
+            .withColumn("month", F.month("started_at").cast(T.ByteType())))
+
+
+def daily_rollup(trips):
+    """Trips, average duration and rider mix per day"""
+    return (trips
+            .groupBy(F.to_date("started_at").alias("date"))
+            .agg(F.count(F.lit(1)).alias("trips"),
+                 F.avg("trip_duration_s").alias("avg_duration_s"),
+                 F.sum(F.when(F.col("member_casual") == "member", 1).otherwise(0)).alias("member_trips"),
+                 F.sum(F.when(F.col("member_casual") == "casual", 1).otherwise(0)).alias("casual_trips"))
+            .withColumn("year", F.year("date").cast(T.ShortType()))
+            .withColumn("month", F.month("date").cast(T.ByteType())))
+
+
+def station_daily_rollup(trips):
+    """Departures and arrivals per station and day"""
+    departures = (trips
+                  .where(F.col("start_station_id").isNotNull())
+                  .groupBy(F.to_date("started_at").alias("date"), F.col("start_station_id").alias("station_id"))
+                  .agg(F.count(F.lit(1)).alias("departures"),
+                       F.avg("trip_duration_s").alias("avg_duration_s")))
+    arrivals = (trips
+                .where(F.col("end_station_id").isNotNull() & F.col("ended_at").isNotNull())
+                .groupBy(F.to_date("ended_at").alias("date"), F.col("end_station_id").alias("station_id"))
+                .agg(F.count(F.lit(1)).alias("arrivals")))
+    return (departures
+            .join(arrivals, ["date", "station_id"], "full_outer")
+            .fillna(0, subset=["departures", "arrivals"])
+            .withColumn("year", F.year("date").cast(T.ShortType()))
+            .withColumn("month", F.month("date").cast(T.ByteType())))
+
+
+def table_exists(spark, table):
+    try:
+        spark.sql(f"DESCRIBE TABLE {table}")
+        return True
+    except AnalysisException:
+        return False
+
+
+def write_table(spark, df, name, output_format="iceberg", catalog="iceberg", namespace="citibike",
+                output_dir=OUTPUT_DIR, sort_columns=()):
+    """Write a DataFrame partitioned by year/month, replacing only the months it holds"""
+    # One writer per month, sorted so parquet min/max statistics prune well
+    df = df.repartition("year", "month").sortWithinPartitions("year", "month", *sort_columns)
+    if output_format == "iceberg":
+        table = f"{catalog}.{namespace}.{name}"
+        if table_exists(spark, table):
+            df.writeTo(table).overwritePartitions()
+        else:
+            spark.sql(f"CREATE NAMESPACE IF NOT EXISTS {catalog}.{namespace}")
+            (df.writeTo(table)
+               .using("iceberg")
+               .tableProperty("write.parquet.compression-codec", "zstd")
+               .partitionedBy(F.col("year"), F.col("month"))
+               .create())
+        logging.info("Wrote iceberg table %s", table)
+    else:
+        path = f"{output_dir.rstrip('/')}/{name}"
+        (df.write
+           .mode("overwrite")
+           .option("compression", "zstd")
+           .partitionBy("year", "month")
+           .parquet(path))
+        logging.info("Wrote parquet dataset %s", path)
+
+
+def main(params):
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s')
+    spark = create_spark_session(params.master, warehouse=params.warehouse, catalog=params.catalog)
+    write = partial(write_table, spark, output_format=params.format, catalog=params.catalog,
+                    namespace=params.namespace, output_dir=params.output)
+    try:
+        trips = read_trips(spark, params.input)
+        # Parsed once, written once and aggregated twice
+        trips.persist(StorageLevel.MEMORY_AND_DISK)
+        write(trips, "trips", sort_columns=("start_station_id", "started_at"))
+        write(daily_rollup(trips), "daily_trips", sort_columns=("date",))
+        write(station_daily_rollup(trips), "station_daily", sort_columns=("station_id", "date"))
+        trips.unpersist()
+    finally:
+        spark.stop()
+
+
+if __name__ == '__main__':
+    ## Define CLI arguments
+    parser = argparse.ArgumentParser(description='Backfill raw Citi Bike trip csvs into partitioned Iceberg or Parquet tables with Spark')
+
+    parser.add_argument('--master', required=False, help='spark master url, local[*] runs on this machine', default=os.environ.get("SPARK_MASTER_URL", "local[*]"))
+    parser.add_argument('--input', required=False, help='directory of raw trip csvs, local path or s3a:// url', default=INPUT_DIR)
+    parser.add_argument('--format', required=False, choices=FORMATS, help='write iceberg tables or plain parquet datasets', default="iceberg")
+    parser.add_argument('--catalog', required=False, help='iceberg catalog configured in spark-defaults.conf', default="iceberg")
+    parser.add_argument('--namespace', required=False, help='iceberg namespace of the tables', default="citibike")
+    parser.add_argument('--warehouse', required=False, help='iceberg hadoop catalog warehouse for local runs (overrides spark-defaults.conf)', default=None)
+    parser.add_argument('--output', required=False, help='output directory of the parquet datasets with --format parquet', default=OUTPUT_DIR)
+
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pytest
+from sqlalchemy import text
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from bigquery_export import export_year, partition_query
+from checkpoints import completed_sources, create_checkpoint_table
+from chunking import ChunkSizer
+from loaders import get_to_sql_method
+
+
+## Declare global variables
+TABLE = "citibike_trips_2013"
+# Two trips per month; the second one's rider gave no birth year
+TRIPS = pa.table({
+    "tripduration": pa.array([600, 900] * 12, pa.int64()),
+    "starttime": pa.array([datetime(2013, month, day, 8) for month in range(1, 13) for day in (1, 28)],
+                          pa.timestamp("us")),
+    "bikeid": pa.array(range(24), pa.int64()),
+    "usertype": pa.array(["Subscriber", "Customer"] * 12),
+    "birth_year": pa.array([1983, None] * 12, pa.int64()),
+})
+
+
+class FakeRows:
+    def __init__(self, table):
+        self.table = table
+
+    def to_arrow(self):
+        return self.table
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        # One batch per trip, regrouped into chunks holding a birth year and a null
+        yield from self.table.to_batches(max_chunksize=1)
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def result(self):
+        return self.rows
+
+
+class FakeClient:
+    """bigquery.Client answering the export's queries from TRIPS, failing the months in fail_months"""
+
+    def __init__(self, fail_months=()):
+        self.fail_months = set(fail_months)
+        self.months_queried = []
+
+    def query(self, sql):
+        if "LIMIT 0" in sql:
+            return FakeQuery(FakeRows(TRIPS.slice(0, 0)))
+        start, end = (datetime.fromisoformat(value) for value in re.findall(r"DATETIME '([^']+)'", sql))
+        self.months_queried.append(start.month)
+        if start.month in self.fail_months:
+            raise RuntimeError(f"query of {start:%Y-%m} failed")
+        starttime = TRIPS["starttime"].to_pylist()
+        return FakeQuery(FakeRows(TRIPS.filter(pa.array([start <= value < end for value in starttime]))))
+
+
+def export(client, engine, checkpoint=False):
+    return export_year(client, 2013, TABLE, engine, to_sql_method=get_to_sql_method("copy"),
+                       workers=3, chunk_sizer=ChunkSizer(2), checkpoint=checkpoint)
+
+
+def test_partition_query_compares_datetime_literals():
+    sql = partition_query(datetime(2013, 7, 1).date(), datetime(2013, 8, 1).date())
+
+    assert "starttime >= DATETIME '2013-07-01'" in sql
+    assert "starttime < DATETIME '2013-08-01'" in sql
+
+
+def test_export_copies_nullable_birth_years_into_bigint(pg_engine):
+    assert export(FakeClient(), pg_engine) == TRIPS.num_rows
+
+    with pg_engine.connect() as conn:
+        column_type = conn.execute(text("SELECT data_type FROM information_schema.columns "
+                                        "WHERE table_name = :table AND column_name = 'birth_year'"),
+                                   {"table": TABLE}).scalar()
+        birth_years = conn.execute(text(f"SELECT birth_year, count(*) FROM {TABLE} GROUP BY 1")).fetchall()
+    assert column_type == "bigint"
+    assert sorted(birth_years, key=str) == [(1983, 12), (None, 12)]
+
+
+def test_checkpointed_export_resumes_with_the_missing_months(pg_engine):
+    create_checkpoint_table(pg_engine)
+    with pytest.raises(RuntimeError, match=r"1 of 12 items failed"):
+        export(FakeClient(fail_months=[7]), pg_engine, checkpoint=True)
+    with pg_engine.connect() as conn:
+        assert len(completed_sources(conn, TABLE)) == 11
+
+    # The re-run only fetches July, appended to the months already committed
+    client = FakeClient()
+    assert export(client, pg_engine, checkpoint=True) == 2
+    assert client.months_queried == [7]
+    with pg_engine.connect() as conn:
+        assert conn.execute(text(f"SELECT count(*) FROM {TABLE}")).scalar() == TRIPS.num_rows
+        assert len(completed_sources(conn, TABLE)) == 12
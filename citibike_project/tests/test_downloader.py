@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import os
+import sys
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from time import perf_counter
+
+import pytest
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from downloader import RateLimiter, make_session, fetch_file
+
+
+## Declare global variables
+ARCHIVE_NAME = "202401-citibike-tripdata.zip"
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)  # spans several download chunks
+ETAG = '"202401-v1"'
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class _BucketHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD like the S3 bucket: ETag, conditional GETs and single byte ranges"""
+
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body, status = PAYLOAD, 200
+        byte_range = self.headers.get("Range")
+        if byte_range and self.headers.get("If-Range", ETAG) == ETAG:
+            start = int(byte_range.split("=")[1].split("-")[0])
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+                self.end_headers()
+                return
+            body, status = PAYLOAD[start:], 206
+
+        self.send_response(status)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {len(PAYLOAD) - len(body)}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def bucket():
+    """Local HTTP server standing in for the Citi Bike bucket, yields the archive url"""
+    _BucketHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BucketHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/{ARCHIVE_NAME}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fetch_file_downloads_and_records_etag(bucket, tmp_path):
+    file_path = fetch_file(bucket, tmp_path, session=make_session())
+
+    assert file_path == tmp_path / ARCHIVE_NAME
+    assert file_path.read_bytes() == PAYLOAD
+    assert not Path(f"{file_path}.part").exists()
+    assert json.loads(Path(f"{file_path}.meta.json").read_text())["etag"] == ETAG
+
+
+def test_fetch_file_resumes_partial_download(bucket, tmp_path):
+    # An interrupted run left the first MB and the object's ETag behind
+    fetch_file(bucket, tmp_path, session=make_session())
+    file_path = tmp_path / ARCHIVE_NAME
+    file_path.rename(f"{file_path}.part")
+    with open(f"{file_path}.part", "r+b") as f:
+        f.truncate(1024 * 1024)
+
+    fetch_file(bucket, tmp_path, session=make_session())
+
+    headers = _BucketHandler.requests_seen[-1]
+    assert headers["Range"] == f"bytes={1024 * 1024}-"
+    assert headers["If-Range"] == ETAG
+    assert file_path.read_bytes() == PAYLOAD
+
+
+def test_fetch_file_completes_part_file_holding_whole_object(bucket, tmp_path):
+    fetch_file(bucket, tmp_path, session=make_session())
+    file_path = tmp_path / ARCHIVE_NAME
+    file_path.rename(f"{file_path}.part")
+
+    # The server answers 416 for a range starting past the end
+    fetch_file(bucket, tmp_path, session=make_session())
+
+    assert file_path.read_bytes() == PAYLOAD
+    assert not Path(f"{file_path}.part").exists()
+
+
+def test_fetch_file_skips_unchanged_archive(bucket, tmp_path):
+    file_path = fetch_file(bucket, tmp_path, session=make_session())
+    mtime = file_path.stat().st_mtime_ns
+
+    assert fetch_file(bucket, tmp_path, session=make_session()) == file_path
+
+    headers = _BucketHandler.requests_seen[-1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    assert file_path.stat().st_mtime_ns == mtime
+
+
+def test_fetch_file_respects_bandwidth_limit(bucket, tmp_path):
+    # The bucket starts full (one second of tokens), the rest of the payload is throttled
+    bytes_per_second = 1024 * 1024
+    start = perf_counter()
+    fetch_file(bucket, tmp_path, session=make_session(), rate_limiter=RateLimiter(bytes_per_second))
+    elapsed = perf_counter() - start
+
+    assert elapsed >= (len(PAYLOAD) - bytes_per_second) / bytes_per_second * 0.9
+    assert (tmp_path / ARCHIVE_NAME).read_bytes() == PAYLOAD
+
+
+def test_rate_limiter_shared_by_threads():
+    limiter = RateLimiter(4 * 1024 * 1024)
+    start = perf_counter()
+    threads = [threading.Thread(target=lambda: [limiter.consume(512 * 1024) for _ in range(4)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 8 MB through a 4 MB/s bucket that starts with 4 MB of tokens
+    assert perf_counter() - start >= 0.9
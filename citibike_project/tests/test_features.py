@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+import ingest_data
+
+
+## Declare global variables
+ARCHIVE_URL = "http://localhost/202401-citibike-tripdata.zip"
+STATIONS = ["6140.05", "5593.01", "5329.03"]
+TRIPS = 600
+CHUNK_SIZE = 40  # many small chunks sharing the same station hours
+
+
+def write_month(root):
+    """Extract directory of one modern archive, as the extract stage leaves it"""
+    folder = root / "data" / "citibike_data" / "unzipped_files" / "202401"
+    folder.mkdir(parents=True)
+    started_at = pd.Timestamp("2024-01-05 10:00:00") + pd.to_timedelta(range(TRIPS), unit="s") * 20
+    trips = pd.DataFrame({
+        "ride_id": [f"R{i}" for i in range(TRIPS)],
+        "rideable_type": "classic_bike",
+        "started_at": started_at,
+        "ended_at": started_at + pd.Timedelta(minutes=12),
+        "start_station_name": [f"Station {STATIONS[i % 3]}" for i in range(TRIPS)],
+        "start_station_id": [STATIONS[i % 3] for i in range(TRIPS)],
+        "end_station_name": [f"Station {STATIONS[(i + 1) % 3]}" for i in range(TRIPS)],
+        "end_station_id": [STATIONS[(i + 1) % 3] for i in range(TRIPS)],
+        "start_lat": 40.74, "start_lng": -73.99, "end_lat": 40.72, "end_lng": -73.98,
+        "member_casual": "member",
+    })
+    trips.to_csv(folder / "202401-citibike-tripdata.csv", index=False)
+    return trips
+
+
+def run_stage(pg_url, stage, *options):
+    url = pg_url
+    argv = ["--host", url.host, "--port", str(url.port), "--user", url.username, "--password", url.password,
+            "--db", url.database, "--manifest", "", "--report", "run_report.json", "--parser", "pandas",
+            "--chunk_size", str(CHUNK_SIZE), "--stage", stage, "--archive", ARCHIVE_URL, *options]
+    return ingest_data.main(ingest_data.build_parser().parse_args(argv))
+
+
+def load_month(pg_url, *options):
+    # As the airflow DAG runs them: the tables are set up once, before the load tasks
+    run_stage(pg_url, "setup", *options)
+    return run_stage(pg_url, "load", *options)
+
+
+def hourly_demand(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT station_id, hour, sum(departures), sum(arrivals) "
+                                 "FROM station_hourly_demand GROUP BY station_id, hour"))
+        return {(station, hour): (departures, arrivals) for station, hour, departures, arrivals in rows}
+
+
+def expected_demand(trips):
+    departures = trips.groupby(["start_station_id", trips["started_at"].dt.floor("h")]).size()
+    arrivals = trips.groupby(["end_station_id", trips["ended_at"].dt.floor("h")]).size()
+    counts = pd.concat([departures.rename("departures"), arrivals.rename("arrivals")], axis=1).fillna(0)
+    return {key: (int(row.departures), int(row.arrivals)) for key, row in counts.iterrows()}
+
+
+@pytest.mark.parametrize("load_writers", [1, 3])
+def test_reload_with_writers_replaces_hourly_demand(pg_url, pg_engine, tmp_path, monkeypatch, load_writers):
+    monkeypatch.chdir(tmp_path)
+    trips = write_month(tmp_path)
+
+    # Loaded twice: the second load replaces the first one's trips and counts
+    for _ in range(2):
+        assert load_month(pg_url, "--features", "--load_writers", str(load_writers)) == TRIPS
+
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM citibike_trips")).scalar() == TRIPS
+    assert hourly_demand(pg_engine) == expected_demand(trips)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+from pathlib import Path
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+import ingest_data
+
+
+def test_file_stages_run_without_the_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Nothing listens on port 9: a stage connecting to postgres would fail
+    argv = ["--host", "127.0.0.1", "--port", "9", "--manifest", "", "--report", "run_report.json",
+            "--normalize", "--station_keys", "--features", "--checkpoint",
+            "--stage", "compress", "--archive", "http://localhost/202401-citibike-tripdata.zip"]
+
+    assert ingest_data.main(ingest_data.build_parser().parse_args(argv)) == []
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from loaders import pipelined_load
+
+
+## Declare global variables
+CHUNKS = 10
+CHUNK_ROWS = 100
+
+
+@pytest.fixture
+def engine(pg_engine):
+    """Test database holding an empty trips table and one row of an earlier load"""
+    with pg_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE trips (n INTEGER)"))
+        conn.execute(text("INSERT INTO trips VALUES (-1)"))
+    return pg_engine
+
+
+def make_chunks(chunks=CHUNKS):
+    for i in range(chunks):
+        yield pd.DataFrame({"n": range(i * CHUNK_ROWS, (i + 1) * CHUNK_ROWS)})
+
+
+def write_chunk(conn, df):
+    df.to_sql("trips", conn, if_exists="append", index=False)
+
+
+def failing_write_chunk(conn, df):
+    # Fails once the other writers have loaded, and may be waiting to commit, their first chunks
+    if df["n"].iloc[0] == 5 * CHUNK_ROWS:
+        raise ValueError("bad chunk")
+    write_chunk(conn, df)
+
+
+def delete_earlier_rows(conn):
+    conn.execute(text("DELETE FROM trips"))
+
+
+def table_rows(engine):
+    with engine.connect() as conn:
+        return sorted(n for (n,) in conn.execute(text("SELECT n FROM trips")))
+
+
+def test_writers_load_every_chunk_once(engine):
+    rows_loaded = pipelined_load(make_chunks(), write_chunk, engine, writers=3)
+
+    assert rows_loaded == CHUNKS * CHUNK_ROWS
+    assert table_rows(engine) == [-1] + list(range(CHUNKS * CHUNK_ROWS))
+
+
+def test_prepare_commits_with_the_writers(engine):
+    rows_loaded = pipelined_load(make_chunks(), write_chunk, engine, writers=3, prepare=delete_earlier_rows)
+
+    assert rows_loaded == CHUNKS * CHUNK_ROWS
+    assert table_rows(engine) == list(range(CHUNKS * CHUNK_ROWS))
+
+
+def test_failed_writer_rolls_back_every_writer(engine):
+    with pytest.raises(ValueError, match="bad chunk"):
+        pipelined_load(make_chunks(), failing_write_chunk, engine, writers=3)
+
+    assert table_rows(engine) == [-1]
+
+
+def test_failed_writer_rolls_back_prepare(engine):
+    with pytest.raises(ValueError, match="bad chunk"):
+        pipelined_load(make_chunks(), failing_write_chunk, engine, writers=3, prepare=delete_earlier_rows)
+
+    # The earlier load is still there
+    assert table_rows(engine) == [-1]
+
+
+def test_parse_error_rolls_back_writers_and_prepare(engine):
+    def chunks_then_parse_error():
+        yield from make_chunks(3)
+        raise ValueError("bad csv")
+
+    with pytest.raises(ValueError, match="bad csv"):
+        pipelined_load(chunks_then_parse_error(), write_chunk, engine, writers=2, prepare=delete_earlier_rows)
+
+    assert table_rows(engine) == [-1]
+
+
+def test_failed_prepare_loads_nothing(engine):
+    def failing_prepare(conn):
+        delete_earlier_rows(conn)
+        raise ValueError("prepare failed")
+
+    with pytest.raises(ValueError, match="prepare failed"):
+        pipelined_load(make_chunks(), write_chunk, engine, writers=2, prepare=failing_prepare)
+
+    assert table_rows(engine) == [-1]
+
+
+def test_finalize_commits_with_the_writers(engine):
+    def finalize(conn):
+        # Runs once every chunk is loaded, in the prepare transaction
+        conn.execute(text("INSERT INTO trips SELECT -2"))
+
+    pipelined_load(make_chunks(), write_chunk, engine, writers=3, prepare=delete_earlier_rows, finalize=finalize)
+
+    assert table_rows(engine) == [-2] + list(range(CHUNKS * CHUNK_ROWS))
+
+
+def test_failed_finalize_rolls_back_every_writer(engine):
+    def failing_finalize(conn):
+        raise ValueError("finalize failed")
+
+    with pytest.raises(ValueError, match="finalize failed"):
+        pipelined_load(make_chunks(), write_chunk, engine, writers=3, prepare=delete_earlier_rows,
+                       finalize=failing_finalize)
+
+    assert table_rows(engine) == [-1]
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from normalize import CANONICAL_DTYPES, canonical_frame, normalize_chunk
+
+
+## Declare global variables
+LEGACY_HEADER = ["tripduration", "starttime", "stoptime", "start station id", "start station name",
+                 "start station latitude", "start station longitude", "end station id", "end station name",
+                 "end station latitude", "end station longitude", "bikeid", "usertype", "birth year", "gender"]
+TITLE_CASE_HEADER = ["Trip Duration", "Start Time", "Stop Time", "Start Station ID", "Start Station Name",
+                     "Start Station Latitude", "Start Station Longitude", "End Station ID", "End Station Name",
+                     "End Station Latitude", "End Station Longitude", "Bike ID", "User Type", "Birth Year", "Gender"]
+LEGACY_ROW = [634, pd.Timestamp("2013-07-01 00:00:00"), pd.Timestamp("2013-07-01 00:10:34"), 164, "E 47 St & 2 Ave",
+              40.75, -73.97, 504, "1 Ave & E 15 St", 40.73, -73.98, 16950, "Customer", 1983.0, 1]
+
+
+def legacy_trips(header):
+    return pd.DataFrame([LEGACY_ROW], columns=header)
+
+
+def modern_trips(**columns):
+    trips = {
+        "ride_id": ["A1", "A2"],
+        "rideable_type": ["classic_bike", "electric_bike"],
+        "started_at": pd.to_datetime(["2024-01-05 10:00:00", "2024-01-06 08:30:00"]),
+        "ended_at": pd.to_datetime(["2024-01-05 10:12:00", "2024-01-06 08:45:30"]),
+        "start_station_name": ["W 21 St", "E 2 St"],
+        "start_station_id": ["6140.05", "5593.01"],
+        "end_station_name": ["E 2 St", None],
+        "end_station_id": ["5593.01", None],
+        "start_lat": [40.74, 40.72], "start_lng": [-73.99, -73.98],
+        "end_lat": [40.72, 40.7], "end_lng": [-73.98, -73.9],
+        "member_casual": ["member", "casual"],
+    }
+    trips.update(columns)
+    return pd.DataFrame(trips)
+
+
+def values(column):
+    """Column values with every kind of missing value as None"""
+    return [None if pd.isna(value) else value for value in column]
+
+
+def assert_canonical(trips):
+    assert list(trips.columns) == list(CANONICAL_DTYPES)
+    for name, dtype in CANONICAL_DTYPES.items():
+        assert trips[name].dtype == dtype, name
+
+
+@pytest.mark.parametrize("header", [LEGACY_HEADER, TITLE_CASE_HEADER], ids=["lower_case", "title_case"])
+def test_legacy_columns_map_onto_the_canonical_schema(header):
+    trips = normalize_chunk(legacy_trips(header), source_file="201307-citibike-tripdata.zip")
+
+    assert_canonical(trips)
+    trip = trips.iloc[0]
+    assert trip["started_at"] == pd.Timestamp("2013-07-01 00:00:00")
+    assert trip["ended_at"] == pd.Timestamp("2013-07-01 00:10:34")
+    assert trip["trip_duration_s"] == 634
+    assert (trip["start_station_id"], trip["start_station_name"]) == ("164", "E 47 St & 2 Ave")
+    assert (trip["end_lat"], trip["end_lng"]) == (np.float32(40.73), np.float32(-73.98))
+    assert (trip["bike_id"], trip["birth_year"], trip["gender"]) == (16950, 1983, 1)
+    assert trip["source_file"] == "201307-citibike-tripdata.zip"
+    # Columns the legacy layout doesn't have
+    assert trips["ride_id"].isna().all() and trips["rideable_type"].isna().all()
+
+
+def test_modern_columns_keep_their_values_and_derive_the_duration():
+    trips = normalize_chunk(modern_trips())
+
+    assert_canonical(trips)
+    assert trips["ride_id"].tolist() == ["A1", "A2"]
+    assert trips["rideable_type"].tolist() == ["classic_bike", "electric_bike"]
+    assert trips["trip_duration_s"].tolist() == [720, 930]
+    assert trips["birth_year"].isna().all() and trips["source_file"].isna().all()
+
+
+def test_member_type_maps_onto_member_casual():
+    trips = legacy_trips(LEGACY_HEADER)
+    trips = pd.concat([trips] * 4, ignore_index=True)
+    trips["usertype"] = ["Subscriber", "Customer", None, "Dependent"]
+
+    member_casual = normalize_chunk(trips)["member_casual"]
+
+    assert values(member_casual) == ["member", "casual", None, None]  # missing and unknown user types null
+    assert normalize_chunk(modern_trips())["member_casual"].tolist() == ["member", "casual"]
+
+
+def test_bigquery_gender_and_blank_birth_years():
+    trips = pd.concat([legacy_trips(LEGACY_HEADER)] * 3, ignore_index=True)
+    trips["gender"] = ["male", "Female", "unknown"]
+    trips["birth year"] = [1983.0, np.nan, 1990.0]
+
+    trips = normalize_chunk(trips)
+
+    assert trips["gender"].tolist() == [1, 2, 0]
+    assert values(trips["birth_year"]) == [1983, None, 1990]
+
+
+def test_station_ids_become_text_of_every_layout():
+    legacy = pd.concat([legacy_trips(LEGACY_HEADER)] * 2, ignore_index=True)
+    # A blank station turns the legacy ids of the chunk into floats
+    legacy["end station id"] = [504.0, np.nan]
+    legacy["end station name"] = ["1 Ave & E 15 St", None]
+
+    trips = normalize_chunk(legacy)
+
+    assert trips["start_station_id"].tolist() == ["164", "164"]
+    assert values(trips["end_station_id"]) == ["504", None]
+    assert values(trips["end_station_name"]) == ["1 Ave & E 15 St", None]
+
+
+def test_modern_station_ids_and_names_are_kept_as_parsed():
+    # Text ids keep their trailing zeros, arrow hands them over as categoricals
+    ids = pd.Categorical(["6140.10", "JC013"])
+    trips = normalize_chunk(modern_trips(start_station_id=ids, start_station_name=pd.Categorical(["W 21 St", None])))
+
+    assert trips["start_station_id"].tolist() == ["6140.10", "JC013"]
+    assert values(trips["start_station_name"]) == ["W 21 St", None]
+    assert values(trips["end_station_id"]) == ["5593.01", None]
+
+
+def test_canonical_frame_is_empty_with_the_canonical_schema():
+    trips = canonical_frame()
+
+    assert trips.empty
+    assert_canonical(trips)
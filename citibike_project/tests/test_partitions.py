@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from normalize import normalize_chunk
+from parallel import run_bounded
+from partitions import create_partitioned_table, load_partitioned
+
+
+## Declare global variables
+TABLE = "citibike_trips"
+TRIPS_PER_MONTH = 100
+
+
+def archive_chunks(month, gate=None):
+    """Trips of one monthly archive, the last one started in the previous month"""
+    source_file = f"{month:%Y%m}-citibike-tripdata.zip"
+    started_at = month + pd.to_timedelta(range(TRIPS_PER_MONTH), unit="h")
+    started_at = started_at[:-1].append(pd.DatetimeIndex([month - pd.Timedelta(minutes=10)]))
+    trips = pd.DataFrame({
+        "ride_id": [f"{month:%Y%m}-{i}" for i in range(TRIPS_PER_MONTH)],
+        "started_at": started_at,
+        "ended_at": started_at + pd.Timedelta(minutes=20),
+        "start_station_id": "6140.05",
+        "member_casual": "member",
+    })
+    if gate is not None:
+        # Every concurrent load is inside its transaction before any goes on
+        gate.wait(timeout=30)
+    yield normalize_chunk(trips, source_file=source_file)
+
+
+def load_month(engine, month, gate=None):
+    return load_partitioned(engine, TABLE, archive_chunks(month, gate), f"{month:%Y%m}-citibike-tripdata.zip")
+
+
+def month_counts(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT tableoid::regclass::text, count(*) FROM {TABLE} GROUP BY 1"))
+        return dict(rows.fetchall())
+
+
+def test_reload_replaces_months_and_boundary_rows(pg_engine):
+    create_partitioned_table(pg_engine, TABLE)
+    for _ in range(2):
+        for month in [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-01")]:
+            assert load_month(pg_engine, month) == TRIPS_PER_MONTH
+
+    # December only holds January's boundary trip, January holds February's
+    assert month_counts(pg_engine) == {f"{TABLE}_202312": 1, f"{TABLE}_202401": TRIPS_PER_MONTH,
+                                       f"{TABLE}_202402": TRIPS_PER_MONTH - 1}
+
+
+def test_concurrent_reloads_of_adjacent_months(pg_engine):
+    create_partitioned_table(pg_engine, TABLE)
+    months = [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-01")]
+    for month in months:
+        load_month(pg_engine, month)
+
+    for _ in range(3):
+        gate = threading.Barrier(len(months))
+        results = run_bounded(lambda month: load_month(pg_engine, month, gate), months, workers=len(months))
+        assert list(results.values()) == [TRIPS_PER_MONTH] * len(months)
+
+    assert month_counts(pg_engine) == {f"{TABLE}_202312": 1, f"{TABLE}_202401": TRIPS_PER_MONTH,
+                                       f"{TABLE}_202402": TRIPS_PER_MONTH - 1}
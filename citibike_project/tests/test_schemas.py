@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from chunking import ChunkSizer
+from normalize import normalize_chunk
+from schemas import read_csv_chunks, read_pandas_chunks
+
+
+## Declare global variables
+LEGACY_CSV = (
+    "tripduration,starttime,stoptime,start station id,start station name,start station latitude,"
+    "start station longitude,end station id,end station name,end station latitude,end station longitude,"
+    "bikeid,usertype,birth year,gender\n"
+    "634,2013-07-01 00:00:00,2013-07-01 00:10:34,164,E 47 St & 2 Ave,40.75,-73.97,504,1 Ave & E 15 St,"
+    "40.73,-73.98,16950,Customer,\\N,0\n"
+    "1547,2013-07-01 00:00:02,2013-07-01 00:25:49,388,W 26 St & 10 Ave,40.74,-74.0,459,W 20 St & 11 Ave,"
+    "40.74,-74.0,19816,Subscriber,1983,1\n"
+)
+TITLE_CASE_CSV = (
+    "Trip Duration,Start Time,Stop Time,Start Station ID,Start Station Name,Start Station Latitude,"
+    "Start Station Longitude,End Station ID,End Station Name,End Station Latitude,End Station Longitude,"
+    "Bike ID,User Type,Birth Year,Gender\n"
+    "100,10/1/2016 00:00:07,10/1/2016 00:01:47,72,W 52 St,40.76,-73.98,79,Franklin St,40.71,-74.0,"
+    "1234,Subscriber,1980,1\n"
+)
+MODERN_CSV = (
+    "ride_id,rideable_type,started_at,ended_at,start_station_name,start_station_id,end_station_name,"
+    "end_station_id,start_lat,start_lng,end_lat,end_lng,member_casual\n"
+    "A1,classic_bike,2024-01-05 10:00:00,2024-01-05 10:12:00,W 21 St,6140.05,E 2 St,5593.01,"
+    "40.74,-73.99,40.72,-73.98,member\n"
+)
+READERS = {"pandas": read_pandas_chunks, "arrow": read_csv_chunks}
+
+
+def parse(reader, content, tmp_path, chunksize=1):
+    path = tmp_path / "trips.csv"
+    path.write_text(content)
+    return pd.concat(list(READERS[reader](path, chunksize=chunksize)), ignore_index=True)
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_legacy_header_parses_and_normalizes(reader, tmp_path):
+    df = parse(reader, LEGACY_CSV, tmp_path)
+
+    assert pd.api.types.is_datetime64_any_dtype(df["starttime"])
+    trips = normalize_chunk(df, source_file="201307-citibike-tripdata.zip")
+    assert trips["started_at"].tolist() == [pd.Timestamp("2013-07-01 00:00:00"), pd.Timestamp("2013-07-01 00:00:02")]
+    assert trips["birth_year"].tolist() == [pd.NA, 1983]  # \N is null
+    assert trips["member_casual"].tolist() == ["casual", "member"]
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_title_case_legacy_header_parses_us_dates(reader, tmp_path):
+    trips = normalize_chunk(parse(reader, TITLE_CASE_CSV, tmp_path))
+
+    assert trips["started_at"][0] == pd.Timestamp("2016-10-01 00:00:07")
+    assert trips["trip_duration_s"][0] == 100
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_modern_header_parses(reader, tmp_path):
+    trips = normalize_chunk(parse(reader, MODERN_CSV, tmp_path))
+
+    assert trips["ended_at"][0] == pd.Timestamp("2024-01-05 10:12:00")
+    assert trips["trip_duration_s"][0] == 720
+
+
+def test_pandas_reader_takes_open_files_and_sized_chunks():
+    # Zip members are read as open binary files, in chunks sized by the loader's controller
+    chunks = list(read_pandas_chunks(io.BytesIO(LEGACY_CSV.encode()), chunksize=ChunkSizer(1)))
+
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert pd.api.types.is_datetime64_any_dtype(chunks[1]["stoptime"])
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_station_ids_keep_their_text(reader, tmp_path):
+    trips = normalize_chunk(parse(reader, MODERN_CSV.replace("6140.05", "6140.10"), tmp_path))
+
+    assert trips["start_station_id"].tolist() == ["6140.10"]
+    assert trips["end_station_id"].tolist() == ["5593.01"]
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+import argparse
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyspark")
+pq = pytest.importorskip("pyarrow.parquet")
+
+# Code under test lives in the spark-submit app
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "spark-submit" / "app"))
+
+import my_spark_job
+
+
+## Declare global variables
+# One month of each csv layout: modern, legacy (with \N blanks) and the title-case 2016-2017 variant
+LAYOUTS = {
+    "202401": (
+        "ride_id,rideable_type,started_at,ended_at,start_station_name,start_station_id,end_station_name,"
+        "end_station_id,start_lat,start_lng,end_lat,end_lng,member_casual\n"
+        "A1,classic_bike,2024-01-05 10:00:00,2024-01-05 10:12:00,W 21 St,6140.05,E 2 St,5593.01,"
+        "40.74,-73.99,40.72,-73.98,member\n"
+        "A2,electric_bike,2024-01-06 08:30:00.123,2024-01-06 08:45:00.456,E 2 St,5593.01,,,"
+        "40.72,-73.98,40.7,-73.9,casual\n"
+    ),
+    "201307": (
+        "tripduration,starttime,stoptime,start station id,start station name,start station latitude,"
+        "start station longitude,end station id,end station name,end station latitude,end station longitude,"
+        "bikeid,usertype,birth year,gender\n"
+        "634,2013-07-01 00:00:00,2013-07-01 00:10:34,164,E 47 St & 2 Ave,40.75,-73.97,504,1 Ave & E 15 St,"
+        "40.73,-73.98,16950,Customer,\\N,0\n"
+    ),
+    "201610": (
+        "Trip Duration,Start Time,Stop Time,Start Station ID,Start Station Name,Start Station Latitude,"
+        "Start Station Longitude,End Station ID,End Station Name,End Station Latitude,End Station Longitude,"
+        "Bike ID,User Type,Birth Year,Gender\n"
+        "100,10/1/2016 00:00:07,10/1/2016 00:10:07,72,W 52 St,40.76,-73.98,79,Franklin St,40.71,-74.0,"
+        "1234,Subscriber,1980,1\n"
+    ),
+}
+
+
+def write_months(root, months):
+    for month in months:
+        folder = root / month
+        folder.mkdir(parents=True)
+        (folder / f"{month}-citibike-tripdata.csv").write_text(LAYOUTS[month])
+
+
+def run_job(input_dir, output_dir):
+    my_spark_job.main(argparse.Namespace(master="local[2]", input=str(input_dir), format="parquet",
+                                         catalog="iceberg", namespace="citibike", warehouse=None,
+                                         output=str(output_dir)))
+
+
+def read_dataset(path):
+    return pq.read_table(path, partitioning="hive").to_pandas()
+
+
+def test_backfill_runs_locally_on_every_layout(tmp_path):
+    write_months(tmp_path / "raw", LAYOUTS)
+    run_job(tmp_path / "raw", tmp_path / "out")
+
+    trips = read_dataset(tmp_path / "out" / "trips")
+    assert sorted(zip(trips["year"], trips["month"])) == [(2013, 7), (2016, 10), (2024, 1), (2024, 1)]
+    assert list(trips.columns[:18]) == [name for name, _ in my_spark_job.CANONICAL_SCHEMA]
+
+    legacy = trips[trips["year"] == 2013].iloc[0]
+    assert legacy["member_casual"] == "casual"
+    assert legacy["start_station_id"] == "164"
+    assert legacy["birth_year"] != legacy["birth_year"]  # \N is null
+    title_case = trips[trips["year"] == 2016].iloc[0]
+    assert str(title_case["started_at"]) == "2016-10-01 00:00:07"
+    assert title_case["birth_year"] == 1980
+    modern = trips[trips["ride_id"] == "A1"].iloc[0]
+    assert modern["trip_duration_s"] == 720  # derived from the timestamps
+
+    daily = read_dataset(tmp_path / "out" / "daily_trips")
+    assert daily["trips"].sum() == 4
+    stations = read_dataset(tmp_path / "out" / "station_daily")
+    assert stations["departures"].sum() == 4
+    assert stations["arrivals"].sum() == 3  # one modern trip has no end station
+
+
+def test_rerun_replaces_only_its_months(tmp_path):
+    write_months(tmp_path / "raw", LAYOUTS)
+    run_job(tmp_path / "raw", tmp_path / "out")
+
+    write_months(tmp_path / "rerun", ["201307"])
+    run_job(tmp_path / "rerun", tmp_path / "out")
+
+    trips = read_dataset(tmp_path / "out" / "trips")
+    assert sorted(zip(trips["year"], trips["month"])) == [(2013, 7), (2016, 10), (2024, 1), (2024, 1)]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+## Import necessary libraries
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+# Code under test lives in the etl service
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+
+from normalize import normalize_chunk
+from parallel import run_bounded
+from stations import StationIndex
+
+
+def trips(stations):
+    return normalize_chunk(pd.DataFrame({
+        "ride_id": [f"R{i}" for i in range(len(stations))],
+        "started_at": pd.Timestamp("2024-01-05 10:00:00"),
+        "start_station_id": [station_id for station_id, _ in stations],
+        "start_station_name": [name for _, name in stations],
+        "start_lat": 40.74,
+        "start_lng": -73.99,
+    }))
+
+
+def test_station_keys_are_stable_across_indexes(pg_engine):
+    StationIndex(pg_engine).create()
+    first = StationIndex(pg_engine).load()
+    keys = first.encode(trips([("6140.05", "W 21 St"), ("5593.01", "E 2 St"), (None, None)]))["start_station_key"]
+    assert keys.isna().tolist() == [False, False, True]
+    first.conn.close()
+
+    # A later run (or another process) finds the registered keys
+    second = StationIndex(pg_engine).load()
+    again = second.encode(trips([("5593.01", "E 2 St"), ("6140.05", "W 21 St"), ("6140.05", None)]))
+    assert again["start_station_key"].tolist()[:2] == [keys[1], keys[0]]
+    assert again["start_station_key"][2] not in set(keys.dropna())
+    second.conn.close()
+
+
+def test_concurrent_indexes_register_each_station_once(pg_engine):
+    # Separate indexes stand in for the load tasks of concurrent airflow processes
+    StationIndex(pg_engine).create()
+    stations = [(f"{i}.01", f"Station {i}") for i in range(50)]
+    gate = threading.Barrier(4)
+
+    def encode(part):
+        index = StationIndex(pg_engine).load()
+        try:
+            gate.wait(timeout=30)
+            encoded = index.encode(trips(stations[part * 10:part * 10 + 30]))
+            return dict(zip(stations[part * 10:part * 10 + 30], encoded["start_station_key"]))
+        finally:
+            index.conn.close()
+
+    results = run_bounded(encode, range(4), workers=4)
+
+    with pg_engine.connect() as conn:
+        table = {(station_id, name): key for key, station_id, name in
+                 conn.execute(text("SELECT station_key, station_id, station_name FROM stations"))}
+    assert len(table) == len(stations)
+    for keys in results.values():
+        assert all(table[station] == key for station, key in keys.items())